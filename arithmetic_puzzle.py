@@ -1,236 +1,462 @@
-from typing import List, Set, Dict, Tuple, Optional
-from collections import defaultdict
-import operator
+from typing import Callable, Iterator, List, NamedTuple, Set, Dict, Tuple, Optional
+from heapq import heapify, heappop, heappush
+import random
 import time
-from itertools import product
+
+from cages import CageTable
+from constraints import BoundsCageConstraint, CageConstraint, ConstraintGraph, mask_values
+from ordering import ValueOrder, ascending
+from propagation import PropagationQueue, fifo_queue
+from search import RestartSearch, SearchEngine
+from stats import SolverStats
+from tracing import NULL_TRACER, Tracer
+
+
+class SolveResult(NamedTuple):
+    """
+    Outcome of ArithmeticPuzzleSolver.solve_result:
+    - status: "solved", "unsat", "timeout" or "incomplete" ("ac3" alone left
+      open cells)
+    - domains: cell -> values left after AC-3 (None when the algorithm does
+      not run AC-3)
+    - time_ns: phase ("ac3", "search", "total") -> nanoseconds
+    """
+    algorithm: str
+    status: str
+    solution: Optional[Dict[Tuple[int, int], int]]
+    domains: Optional[Dict[Tuple[int, int], Tuple[int, ...]]]
+    time_ns: Dict[str, int]
+
 
 class ArithmeticPuzzleSolver:
-    def __init__(self, n: int, groups: List[Tuple[Set[Tuple[int, int]], str, int]]):
+    def __init__(self, n: int, groups: List[Tuple[Set[Tuple[int, int]], str, int]],
+                 queue_factory: Callable[["ArithmeticPuzzleSolver"], PropagationQueue] = fifo_queue,
+                 all_different: str = "matching", table_limit: int = 100_000,
+                 tie_break: Optional[str] = None, stats: bool = True,
+                 backjumping: bool = False, nogood_limit: int = 0,
+                 var_order: str = "mrv", seed: Optional[int] = None,
+                 restarts: Optional[str] = None, restart_base: Optional[int] = None,
+                 value_order: ValueOrder = ascending, shuffle_values: bool = False):
         self.n = n
         self.groups = groups
+        # "matching" (all-different propagators) or "pairwise" (not-equal arcs)
+        self.all_different = all_different
+        # add/mult cages whose product space n**size exceeds this use bounds
+        # reasoning instead of an enumerated tuple table
+        self.table_limit = table_limit
+        # Builds the AC-3 worklist; see propagation.py for priority orderings
+        self.queue_factory = queue_factory
+        # Conflict-directed backjumping in forward-checking search, and how
+        # many learned nogoods it may keep (0: learn none); see search.py
+        self.backjumping = backjumping
+        self.nogood_limit = nogood_limit
+        # Restart policy for solve(): None, "luby" or "geometric" node
+        # budgets in units of 'restart_base' nodes, by default 100*n*n:
+        # smaller budgets throw away runs that were about to succeed, so only
+        # runs deep into a heavy tail are restarted (see search.RestartSearch)
+        if restarts not in (None, "luby", "geometric"):
+            raise ValueError(f"Unknown restarts policy: {restarts}")
+        self.restarts = restarts
+        self.restart_base = restart_base if restart_base is not None else 100 * n * n
+        # Ties between equally good cells are broken at random when seeded,
+        # reshuffled at every restart; with shuffle_values, each cell's values
+        # are also shuffled before value_order sorts them
+        self.seed = seed
+        self._rng = random.Random(seed) if seed is not None else None
+        if shuffle_values and seed is None:
+            raise ValueError("shuffle_values needs a seed")
+        self.shuffle_values = shuffle_values
+        # Order in which search tries a cell's values; see ordering.py
+        self.value_order = value_order
+        # Last value forward checking accepted for each cell (phase saving)
+        self._phases: Dict[Tuple[int, int], int] = {}
+        # Search/propagation counters and phase timers (None when disabled)
+        self.stats: Optional[SolverStats] = SolverStats() if stats else None
+        # Receives diagnostics during solve_result (see tracing.py)
+        self.tracer: Tracer = NULL_TRACER
+        # Outcome of an AC-3 already applied to the domains (a loaded
+        # artifact, see artifacts.py); the next solve uses it instead of
+        # running AC-3 again
+        self._ac3_result: Optional[bool] = None
         self.variables = [(i, j) for i in range(n) for j in range(n)]
-        self.domains = {var: set(range(1, n + 1)) for var in self.variables}
+        # Domains are integer bitmasks: bit v is set when value v is still
+        # possible for the cell (bit 0 is unused), so {1, 3, 4} is 0b11010.
+        self.full_mask = ((1 << n) - 1) << 1
+        self.domains = {var: self.full_mask for var in self.variables}
+        # Undo log of (var, previous mask) entries; a decision level is just
+        # the trail length when it started, and backtracking pops back to it.
+        self._trail: List[Tuple[Tuple[int, int], int]] = []
+        self._clear_reasons()
         self.constraints = self._create_constraints()
+        # Optional MRV tie-break: None (row-major), "degree" or "cage" (see _tie_ranks)
+        self.tie_break = tie_break
+        self._rank = self._tie_ranks(tie_break)
+        if self._rng is not None:
+            self._shuffle_ranks()
+        # Variable ordering: "mrv" (smallest domain, via the buckets below)
+        # or "dom/wdeg" (smallest domain per unit of failure weight)
+        if var_order not in ("mrv", "dom/wdeg"):
+            raise ValueError(f"Unknown var_order: {var_order}")
+        self.var_order = var_order
+        if restarts is not None and seed is None and var_order == "mrv" and not (backjumping and nogood_limit):
+            # Every run would replay the same search
+            raise ValueError("restarts need a seed, var_order='dom/wdeg' or learned nogoods to vary the search")
+        # dom/wdeg: per-cell sum of the weights of its constraints. Every
+        # constraint starts at 1 and gains 1 per domain wipeout it causes;
+        # the weights persist across restarts.
+        self._weights: Optional[Dict[Tuple[int, int], int]] = None
+        if var_order == "dom/wdeg":
+            self._weights = {var: len(self.constraints.neighbors[var]) + len(self.constraints.watchers[var])
+                             for var in self.variables}
+        # MRV buckets: _buckets[k] is a heap of (rank, cell) for the unassigned
+        # cells with k values left. _set_domain/_undo move cells between
+        # buckets as domains change; entries left behind are skipped lazily.
+        self._buckets: List[List[Tuple[tuple, Tuple[int, int]]]] = []
+        self._bucket_of: Dict[Tuple[int, int], int] = {}
+        self._bucket_counts: List[int] = []
+        self._reset_buckets({})
+
+    def domain_values(self, var: Tuple[int, int]) -> List[int]:
+        """Current domain of 'var' as a sorted list of values."""
+        return list(mask_values(self.domains[var]))
+
+    def _clear_reasons(self) -> None:
+        """
+        Forget all pruning reasons. With backjumping, _reasons[var] is a
+        bitmask of the decision levels (bit k: the k-th choice point) whose
+        assignments removed values from var's domain; _set_domain charges
+        each narrowing to the levels in _cause, and _conflict holds the
+        reasons of the last domain wipeout.
+        """
+        self._reasons: Optional[Dict[Tuple[int, int], int]] = (
+            {var: 0 for var in self.variables} if self.backjumping else None)
+        # Undo log of (trail length, var, previous reasons)
+        self._reason_trail: List[Tuple[int, Tuple[int, int], int]] = []
+        self._cause = 0
+        self._conflict = 0
+
+    def _set_domain(self, var: Tuple[int, int], mask: int) -> None:
+        """Narrow the domain of 'var', recording the old mask on the trail."""
+        old = self.domains[var]
+        if mask != old:
+            reasons = self._reasons
+            if reasons is not None:
+                reason = reasons[var] | self._cause
+                if reason != reasons[var]:
+                    self._reason_trail.append((len(self._trail), var, reasons[var]))
+                    reasons[var] = reason
+            self._trail.append((var, old))
+            self.domains[var] = mask
+            if self._bucket_of[var] >= 0:
+                self._bucket_move(var, mask.bit_count())
+
+    def _undo(self, mark: int) -> None:
+        """Roll the domains back to the state when the trail had 'mark' entries."""
+        trail = self._trail
+        domains = self.domains
+        bucket_of = self._bucket_of
+        while len(trail) > mark:
+            var, old = trail.pop()
+            domains[var] = old
+            if bucket_of[var] >= 0:
+                self._bucket_move(var, old.bit_count())
+        if self._reasons is not None:
+            reason_trail = self._reason_trail
+            while reason_trail and reason_trail[-1][0] >= mark:
+                _, var, old = reason_trail.pop()
+                self._reasons[var] = old
+
+    def _reset_buckets(self, assignment: Dict[Tuple[int, int], int]) -> None:
+        """Rebuild the MRV buckets from scratch for the cells not in 'assignment'."""
+        self._buckets = [[] for _ in range(self.n + 2)]
+        self._bucket_counts = [0] * (self.n + 2)
+        self._bucket_of = {var: -1 for var in self.variables}
+        for var in self.variables:
+            if var not in assignment:
+                self._bucket_move(var, self.domains[var].bit_count())
+
+    def _bucket_move(self, var: Tuple[int, int], size: int) -> None:
+        """Put 'var' in the bucket for 'size' values, or untrack it if size is -1."""
+        counts = self._bucket_counts
+        old = self._bucket_of[var]
+        if old >= 0:
+            counts[old] -= 1
+        self._bucket_of[var] = size
+        if size >= 0:
+            counts[size] += 1
+            heap = self._buckets[size]
+            heappush(heap, (self._rank[var], var))
+            if len(heap) > 4 * counts[size] + 32:
+                # too many stale entries: keep one entry per live cell
+                live = {v for _, v in heap if self._bucket_of[v] == size}
+                heap[:] = [(self._rank[v], v) for v in live]
+                heapify(heap)
+
+    def _mark_assigned(self, var: Tuple[int, int]) -> None:
+        self._bucket_move(var, -1)
+
+    def _mark_unassigned(self, var: Tuple[int, int]) -> None:
+        self._bucket_move(var, self.domains[var].bit_count())
+
+    def _tie_ranks(self, tie_break: Optional[str]) -> Dict[Tuple[int, int], tuple]:
+        """
+        Static MRV tie-break rank per cell, lower wins, row-major order last:
+        - None: row-major order only
+        - "degree": cells constrained by the most other cells (larger cages)
+        - "cage": cells in the tightest cages (fewest valid tuples per cell)
+        """
+        ranks = {}
+        for var in self.variables:
+            if tie_break is None:
+                ranks[var] = 0
+            elif tie_break == "degree":
+                scope = set(self.constraints.neighbors[var])
+                for constraint in self.constraints.watchers[var]:
+                    scope.update(constraint.cells)
+                ranks[var] = -len(scope)
+            elif tie_break == "cage":
+                ranks[var] = float(self.n)
+            else:
+                raise ValueError(f"Unknown tie_break: {tie_break}")
+        if tie_break == "cage":
+            for cage in self.cages:
+                if isinstance(cage, CageConstraint) and cage.table.tuples:
+                    # geometric mean of the choices each cell has in the cage
+                    tightness = len(cage.table.tuples) ** (1 / len(cage.cells))
+                    for cell in cage.cells:
+                        ranks[cell] = min(ranks[cell], tightness)
+        return {var: (ranks[var], index) for index, var in enumerate(self.variables)}
+
+    def _shuffle_ranks(self) -> None:
+        """
+        Redraw the row-major part of the tie-break ranks from the seeded
+        generator: ties go row-major over randomly permuted rows and
+        columns, which varies the order but keeps the search local.
+        """
+        rows = list(range(self.n))
+        cols = list(range(self.n))
+        self._rng.shuffle(rows)
+        self._rng.shuffle(cols)
+        self._rank = {(i, j): (rank, rows[i] * self.n + cols[j])
+                      for (i, j), (rank, _) in self._rank.items()}
+
+    def _bump(self, cells) -> None:
+        """dom/wdeg: a constraint over 'cells' just wiped out a domain."""
+        weights = self._weights
+        for cell in cells:
+            weights[cell] += 1
+
+    def _compile_cage(self, cells: Set[Tuple[int, int]], op: str, target: int):
+        if op in ['add', '+', 'mult', '*'] and self.n ** len(cells) > self.table_limit:
+            return BoundsCageConstraint(cells, op, target, self.n)
+        return CageConstraint(CageTable(cells, op, target, self.n))
+
+    def _create_constraints(self) -> ConstraintGraph:
+        # Row/column all-different propagators (or not-equal arcs) plus one
+        # n-ary propagator per cage, backed by the cage's tuple table or,
+        # for very large add/mult cages, by bounds reasoning
+        self.cages = [self._compile_cage(cells, op, target) for cells, op, target in self.groups]
+        self.cage_tables = [cage.table for cage in self.cages if isinstance(cage, CageConstraint)]
+        return ConstraintGraph(self.n, self.cages, self.all_different)
 
-    def _create_constraints(self) -> Dict:
-        constraints = defaultdict(list)
-        # Row and column constraints
-        for i in range(self.n):
-            for j in range(self.n):
-                # Row constraints
-                for k in range(self.n):
-                    if k != j:
-                        constraints[(i,j)].append(((i,k), lambda x, y: x != y))
-                # Column constraints
-                for k in range(self.n):
-                    if k != i:
-                        constraints[(i,j)].append(((k,j), lambda x, y: x != y))
-
-        # Group arithmetic constraints
-        for cells, op, target in self.groups:
-            for cell in cells:
-                constraints[cell].extend([
-                    (other_cell, lambda x, y, op=op, cells=cells, target=target:
-                     self._check_group_constraint(x, y, op, cells, target))
-                    for other_cell in cells if other_cell != cell
-                ])
-        return constraints
-
-    def _check_group_constraint(self, x: int, y: int, op: str,
-                                    cells: Set[Tuple[int, int]], target: int) -> bool:
-            ops = {
-                '+': operator.add,
-                '-': operator.sub,
-                '*': operator.mul,
-                '/': operator.truediv,
-                'div': operator.truediv,
-                'mult': operator.mul,
-                'sub': operator.sub,
-                'add': operator.add,
-                '': lambda x, y: x  # For single cell groups
-            }
-
-            if op == '':
-                # Single cell group: must match the target exactly
-                return x == target
-
-            if len(cells) == 2:
-                # Two-cell group
-                if op in ['sub', '-']:
-                    return abs(x - y) == target
-                elif op in ['div', '/']:
-                    # Avoid division-by-zero
-                    if x == 0 or y == 0:
-                        return False
-                    return max(x, y) / min(x, y) == target
-                else:
-                    # +, add, *, mult
-                    op_func = ops[op]
-                    return op_func(x, y) == target
-
-            # -----------------------------
-            # STRONGER CHECK FOR 3+ CELLS
-            # -----------------------------
-            # Instead of just "x*y <= target", do a full combination check.
-            # We see if ANY combination of values in these cells' domains
-            # can satisfy the cage constraint while also having
-            # the pair of cells forced to x and y.
-            cell_list = list(cells)
-
-            # We'll figure out which indices correspond to the two cells
-            # in the current arc (we have them as arcs xi->xj in AC3).
-            # Because each call is pairwise, we do not directly know
-            # which (xi, xj) we are. But we know that "x" must belong
-            # to the 'cell' we're currently revising, and "y" must belong
-            # to 'other_cell'. We'll trust that code is consistent with AC3.
-            #
-            # We'll just go ahead and try to find ANY assignment that
-            # respects "cell_list[i1] has value x" and "cell_list[i2] has value y"
-            # that yields the correct group operation result.
-            #
-            # If none works, we return False => prune.
-
-            # For the sake of checking, let's gather each cell's domain:
-            domain_list = [self.domains[c] for c in cell_list]
-
-            # We'll try every possible combination from domain_list
-            # that places x in one cell and y in another cell:
-            def cage_ok(values: List[int]) -> bool:
-                """ Check if the entire 'values' assignment for this cage satisfies op==target. """
-                if op in ['mult','*']:
-                    prod = 1
-                    for v in values:
-                        prod *= v
-                    return prod == target
-                elif op in ['add','+']:
-                    return sum(values) == target
-                elif op in ['sub','-']:
-                    # For 3+ cells, KenKen typically doesn't use sub on 3+ cells,
-                    # but if it did, you'd define the extension. For now, skip or handle similarly
-                    # e.g. pick all permutations, or define a rule. We'll skip for clarity.
-                    return True
-                elif op in ['div','/']:
-                    # Similarly, doesn't normally happen with 3+ cells; skipping here.
-                    return True
-                return True
-
-            # We must place x,y into the correct positions. There are exactly 2 cells in the
-            # cage for our current arc. We'll locate them first:
-            # (This is a hacky approach that works in typical AC3 code. Adjust if needed.)
-            # We'll search for any valid assignment that matches x,y appropriately.
-            valid_combo_found = False
-
-            # For each combination from the Cartesian product of domain_list
-            # consider them as an assignment to cell_list in order
-            # but we also must ensure that the two specific cells
-            # in the "arc" get x, y respectively.
-            for combo in product(*domain_list):
-                # 'combo' is a tuple of length len(cells),
-                # combo[i] is the value assigned to cell_list[i].
-                # We check if x and y are assigned to the correct pair.
-
-                # We'll grab indexes of the pair in cell_list
-                # that correspond to the "current arc" (some AC3 calls).
-                # AC3 code calls _check_group_constraint with x,y for a certain pair,
-                # but we only know that "cell" is the first and "other_cell" the second.
-                # Because this code is reused for each arc, let's do a quick check:
-                #   - 'cell' is the one that triggered this run.
-                #   - 'other_cell' is the neighbor.
-                # We'll find them:
-                # But the function signature doesn't have 'cell' or 'other_cell' explicitly
-                # other than in that constraints creation. Let's do a small trick:
-                # We'll just see if x can appear in exactly one position and y in exactly one position
-                # among the combo (which must be distinct positions).
-                # For KenKen, we expect all digits in one cage to be distinct if they share row/col, but
-                # we won't fully enforce that here—just the cage arithmetic.
-
-                # A simpler approach is: as soon as AC3 calls us with x,y, it wants to see
-                # if there's ANY scenario in which x,y is feasible. We'll check if x,y can appear
-                # in two distinct cells of 'cells'. (In real GAC you'd track exact arcs, but let's keep it minimal.)
-
-                # Count how many times x appears in combo, how many times y appears in combo:
-                # If x,y appear at least once (and in different positions if x!=y), we can check the final arithmetic.
-
-                # However, to be sure that the 'arc' is truly consistent, we do:
-                #   - Exactly one position in combo = x if x != y
-                #   - Another position in combo = y
-                #   - If x == y, then we just need at least two positions that are x.
-
-                # This is not a perfect approach for big puzzles with repeated digits in the same cage,
-                # but standard 4x4 KenKen doesn't allow repeated digits in a single row/col,
-                # so let's keep it simple.
-
-                if x != y:
-                    # We only require that x and y each appear at least once
-                    # so that (xi->x, xj->y) is reflected in 'combo'.
-                    if combo.count(x) >= 1 and combo.count(y) >= 1:
-                        if cage_ok(combo):
-                            valid_combo_found = True
-                            break
-                else:
-                    # x == y case; we want at least two cells in the cage that have that same value
-                    # e.g., if x=2, y=2. We need 2 positions in combo that have '2'
-                    if combo.count(x) >= 2 and cage_ok(combo):
-                        valid_combo_found = True
-                        break
-
-            if not valid_combo_found:
-                # No valid set of values in the entire cage that includes x, y and yields target
-                return False
-
-            return True
-        # (end of _check_group_constraint, rest of the class is unchanged)
-        
     def ac3(self) -> bool:
+        if self.stats is None:
+            return self._ac3()
+        with self.stats.phase("ac3"):
+            return self._ac3()
+
+    def _ac3(self) -> bool:
         for cells, op, target in self.groups:
             if len(cells) == 1:  # Single-cell group
                 cell = next(iter(cells))  # Get the single element from the set
-                self.domains[cell] = {target}  # Restrict its domain to the target number
-        # AC-3 algorithm for domain reduction before backtracking
-        queue = [(xi, xj) for xi in self.variables for xj, _ in self.constraints[xi]]
+                self._set_domain(cell, 1 << target)  # Restrict its domain to the target number
+        # AC-3 algorithm for domain reduction before backtracking: binary arcs
+        # are revised pairwise, rows/columns/cages by their n-ary propagators
+        neighbors = self.constraints.neighbors
+        queue = self.queue_factory(self)
+        queue.extend((xi, xj) for xi in self.variables for xj in neighbors[xi])
+        queue.extend(self.constraints.propagators())
+        return self._propagate_queue(queue)
+
+    def _propagate_queue(self, queue: PropagationQueue) -> bool:
+        """
+        Revise the arcs and run the propagators in 'queue' until nothing
+        changes, queueing whatever depends on a cell whose domain shrank.
+        Returns False on a domain wipeout.
+        """
+        stats = self.stats
+        reasons = self._reasons
         while queue:
-            xi, xj = queue.pop(0)
-            if self._revise(xi, xj):
-                if not self.domains[xi]:
+            if stats is not None and len(queue) > stats.queue_high_water:
+                stats.queue_high_water = len(queue)
+            item = queue.pop()
+            if isinstance(item, tuple):
+                xi, xj = item
+                if reasons is not None:
+                    # A not-equal arc prunes xi because of xj's domain alone
+                    cause, self._cause = self._cause, reasons[xj]
+                    revised = self._revise(xi, xj)
+                    self._cause = cause
+                else:
+                    revised = self._revise(xi, xj)
+                if revised:
+                    if not self.domains[xi]:
+                        if reasons is not None:
+                            self._conflict = reasons[xi]
+                        if self._weights is not None:
+                            self._bump((xi, xj))
+                        return False
+                    self._requeue(queue, xi, skip_arc=xj)
+            else:
+                changed = self._propagate(item)
+                if changed is None:
                     return False
-                for xk, _ in self.constraints[xi]:  # Fixed: Added proper tuple unpacking
-                    if xk != xj:
-                        queue.append((xk, xi))
+                for cell in changed:
+                    self._requeue(queue, cell, skip_propagator=item)
         return True
 
+    def _requeue(self, queue: PropagationQueue, cell: Tuple[int, int],
+                 skip_arc: Optional[Tuple[int, int]] = None, skip_propagator=None) -> None:
+        """Queue everything that depends on 'cell' after its domain shrank."""
+        for xk in self.constraints.neighbors[cell]:
+            if xk != skip_arc:
+                queue.push((xk, cell))  # no-op if the arc is already pending
+        for constraint in self.constraints.watchers[cell]:
+            if constraint is not skip_propagator:
+                queue.push(constraint)
+
+    def _propagate(self, constraint) -> Optional[List[Tuple[int, int]]]:
+        """
+        Run an n-ary propagator and apply its prunings.
+        Returns the cells that changed, or None on a domain wipeout.
+        """
+        if self.stats is not None:
+            self.stats.checks[constraint.kind] += 1
+        prunings = constraint.propagate(self.domains)
+        reasons = self._reasons
+        cause = self._cause
+        if reasons is not None and prunings:
+            # The prunings follow from the domains in the constraint's scope
+            self._cause = self._scope_reasons(constraint.cells)
+        changed = []
+        for cell, mask in prunings:
+            self._set_domain(cell, mask)
+            if not mask:
+                if reasons is not None:
+                    self._conflict = reasons[cell]
+                if self._weights is not None:
+                    self._bump(constraint.cells)
+                changed = None
+                break
+            changed.append(cell)
+        self._cause = cause
+        return changed
+
+    def _scope_reasons(self, cells) -> int:
+        """The decision levels behind the current domains of 'cells'."""
+        reasons = self._reasons
+        levels = 0
+        for cell in cells:
+            levels |= reasons[cell]
+        return levels
+
     def _revise(self, xi: Tuple[int, int], xj: Tuple[int, int]) -> bool:
         revised = False
-        # For each constraint on xi that involves xj
-        for constraint in self.constraints[xi]:
-            if constraint[0] == xj:
-                # For each value in xi's domain
-                for x in self.domains[xi].copy():
-                    # If there's no value in xj's domain that satisfies the constraint, remove x
-                    if not any(constraint[1](x, y) for y in self.domains[xj]):
-                        self.domains[xi].remove(x)
-                        revised = True
+        stats = self.stats
+        if stats is not None:
+            stats.revise_calls += 1
+        # For each constraint on xi that involves xj (O(1) arc lookup)
+        for constraint in self.constraints.arcs[(xi, xj)]:
+            if stats is not None:
+                stats.checks[constraint.kind] += 1
+            domain = constraint.revise(xi, xj, self.domains)
+            if domain != self.domains[xi]:
+                self._set_domain(xi, domain)
+                revised = True
         return revised
-    
-
 
     def mrv(self, assignment: Dict[Tuple[int, int], int]) -> Optional[Tuple[int, int]]:
-        # Minimum Remaining Values heuristic
-        unassigned = [(var, len(self.domains[var]))
-                      for var in self.variables if var not in assignment]
-        return min(unassigned, key=lambda x: x[1])[0] if unassigned else None
+        # Minimum Remaining Values heuristic: the first non-empty bucket holds
+        # the unassigned cells with the fewest values, best tie-break rank on top
+        if self._weights is not None:
+            return self._dom_wdeg(assignment)
+        bucket_of = self._bucket_of
+        for size, heap in enumerate(self._buckets):
+            if self._bucket_counts[size]:
+                while bucket_of[heap[0][1]] != size:
+                    heappop(heap)  # stale entry of a cell that moved on
+                var = heap[0][1]
+                if var in assignment:
+                    # assigned outside the search wrappers; fall back to a scan
+                    self._reset_buckets(assignment)
+                    return self.mrv(assignment)
+                return var
+        return None
+
+    def _dom_wdeg(self, assignment: Dict[Tuple[int, int], int]) -> Optional[Tuple[int, int]]:
+        # The unassigned cell with the smallest domain size / weight ratio
+        bucket_of = self._bucket_of
+        domains = self.domains
+        weights = self._weights
+        rank = self._rank
+        best = None
+        best_key = None
+        for var in self.variables:
+            if bucket_of[var] >= 0 and var not in assignment:
+                key = (domains[var].bit_count() / weights[var], rank[var])
+                if best_key is None or key < best_key:
+                    best, best_key = var, key
+        return best
 
     def forward_check(self, var: Tuple[int, int], value: int, assignment: Dict) -> bool:
         """
         Forward-check: remove values from neighbors' domains that violate constraints
-        given 'var' is assigned 'value'.
+        given 'var' is assigned 'value'. Binary neighbours are filtered directly;
+        then every cell narrowed so far is requeued, and arcs and propagators
+        run to a fixpoint (maintained arc consistency) as in AC-3.
         """
-        for neighbor, constraint in self.constraints[var]:
+        mark = len(self._trail)
+        self._set_domain(var, 1 << value)
+        arcs = self.constraints.arcs
+        stats = self.stats
+        for neighbor in self.constraints.neighbors[var]:
             if neighbor not in assignment:
-                for val in self.domains[neighbor].copy():
-                    if not constraint(value, val):
-                        self.domains[neighbor].remove(val)
+                for constraint in arcs[(var, neighbor)]:
+                    if stats is not None:
+                        stats.checks[constraint.kind] += 1
+                    self._set_domain(neighbor, constraint.forward(var, value, neighbor, self.domains))
                 if not self.domains[neighbor]:
+                    if self._reasons is not None:
+                        self._conflict = self._reasons[neighbor]
+                    if self._weights is not None:
+                        self._bump((var, neighbor))
                     return False
+        if self._reasons is not None and not self._strip_lines(var, value):
+            return False
+        queue = self.queue_factory(self)
+        self._requeue(queue, var)
+        for cell, _ in self._trail[mark:]:
+            self._requeue(queue, cell)
+        return self._propagate_queue(queue)
+
+    def _strip_lines(self, var: Tuple[int, int], value: int) -> bool:
+        """
+        Remove 'value' from the rest of var's row and column. The matching
+        propagators would do it anyway, but only charged to every level
+        behind the whole line; done first, these prunings are charged to
+        this decision alone, which keeps backjumping conflicts small.
+        """
+        keep = ~(1 << value)
+        for constraint in self.constraints.watchers[var]:
+            if constraint.kind == 'all_different':
+                for cell in constraint.cells:
+                    if cell != var:
+                        self._set_domain(cell, self.domains[cell] & keep)
+                        if not self.domains[cell]:
+                            self._conflict = self._reasons[cell]
+                            if self._weights is not None:
+                                self._bump(constraint.cells)
+                            return False
         return True
 
     def _is_consistent(self, var: Tuple[int, int], value: int, assignment: Dict) -> bool:
@@ -238,6 +464,8 @@ class ArithmeticPuzzleSolver:
         Basic consistency check for newly assigned var=value,
         ensuring row/column uniqueness and fully assigned group constraints.
         """
+        if self.stats is not None:
+            self.stats.consistency_checks += 1
         row, col = var
         # Row/column uniqueness
         for i in range(self.n):
@@ -288,29 +516,7 @@ class ArithmeticPuzzleSolver:
         """
         Standard Backtracking (used by solve(..., algorithm="backtracking") or after AC3)
         """
-        if len(assignment) == len(self.variables):
-            return assignment
-
-        var = self.mrv(assignment)
-        if var is None:
-            return None
-
-        for value in self.domains[var].copy():
-            if self._is_consistent(var, value, assignment):
-                assignment[var] = value
-                # Save current domains
-                old_domains = {v: self.domains[v].copy() for v in self.variables}
-
-                if self.forward_check(var, value, assignment):
-                    result = self._backtrack(assignment)
-                    if result is not None:
-                        return result
-
-                # Revert domain changes
-                self.domains = old_domains
-                del assignment[var]
-
-        return None
+        return SearchEngine(self, forward_checking=True, assignment=assignment).run()
 
     def backtrack(self) -> Optional[Dict[Tuple[int, int], int]]:
         """
@@ -320,99 +526,203 @@ class ArithmeticPuzzleSolver:
 
     def _forward_checking_search(self, assignment: Dict[Tuple[int,int], int]) -> Optional[Dict[Tuple[int,int], int]]:
         """
-        Recursively assign variables with forward checking at each step.
+        Assign variables with forward checking at each step.
         """
-        if len(assignment) == len(self.variables):
-            return assignment
-
-        var = self.mrv(assignment)
-        if var is None:
-            return None
-
-        for value in self.domains[var].copy():
-            if self._is_consistent(var, value, assignment):
-                assignment[var] = value
-
-                # Save original domains so we can revert after forward checking
-                saved_domains = {v: self.domains[v].copy() for v in self.variables}
-
-                # If forward checking succeeds, recurse
-                if self.forward_check(var, value, assignment):
-                    result = self._forward_checking_search(assignment)
-                    if result is not None:
-                        return result
-
-                # Revert domains and remove assignment
-                self.domains = saved_domains
-                del assignment[var]
-
-        return None
+        return SearchEngine(self, forward_checking=True, assignment=assignment).run()
 
     def forward_checking(self) -> Optional[Dict[Tuple[int,int], int]]:
         """
         Public method to run forward-checking-based solver.
         """
         return self._forward_checking_search({})
-    
-    def _backtrack_no_forward_check(self, assignment: Dict[Tuple[int, int], int]) -> Optional[Dict[Tuple[int, int], int]]:
-        if len(assignment) == len(self.variables):
-            return assignment  # Found a complete assignment
-
-        var = self.mrv(assignment)
-        if var is None:
-            return None
 
-        # Iterate possible values for var
-        for value in self.domains[var].copy():
-            if self._is_consistent(var, value, assignment):
-                assignment[var] = value
-
-                # Recurse without forward checking
-                result = self._backtrack_no_forward_check(assignment)
-                if result is not None:
-                    return result
-
-                # Revert if failed
-                del assignment[var]
+    def _backtrack_no_forward_check(self, assignment: Dict[Tuple[int, int], int]) -> Optional[Dict[Tuple[int, int], int]]:
+        return SearchEngine(self, forward_checking=False, assignment=assignment).run()
 
-        return None
     def backtrack_no_forward_check(self) -> Optional[Dict[Tuple[int, int], int]]:
         """
         Public method that uses pure backtracking (i.e., NO forward checking).
         """
         # You might (optionally) restore original domains first if needed
-        # e.g. self.domains = {var: set(range(1, self.n + 1)) for var in self.variables}
+        # e.g. self.domains = {var: self.full_mask for var in self.variables}
         return self._backtrack_no_forward_check({})
 
-    def solve(self, algorithm: str = "ac3+backtracking") -> Optional[Dict[Tuple[int, int], int]]:
+    def iter_solutions(self, limit: Optional[int] = None) -> Iterator[Dict[Tuple[int, int], int]]:
+        """
+        Yield the puzzle's solutions one at a time (at most 'limit'). AC-3 runs
+        once; after each solution the same search resumes where it stopped
+        instead of starting over. The search state is unwound when the
+        generator finishes or is closed, keeping the AC-3 prunings.
+        """
+        if limit is not None and limit <= 0:
+            return
+        if not self.ac3():
+            return
+        mark = len(self._trail)
+        engine = SearchEngine(self)
+        try:
+            found = 0
+            while True:
+                solution = engine.run()
+                if solution is None:
+                    return
+                yield solution
+                found += 1
+                if found == limit:
+                    return
+        finally:
+            self._undo(mark)
+            self._reset_buckets({})
+
+    def is_unique(self) -> bool:
+        """True when the puzzle has exactly one solution (stops at the second)."""
+        return sum(1 for _ in self.iter_solutions(limit=2)) == 1
+
+    def _snapshot(self) -> Dict[Tuple[int, int], Tuple[int, ...]]:
+        return {var: mask_values(mask) for var, mask in self.domains.items()}
+
+    def _timed_ac3(self, time_ns: Dict[str, int]) -> bool:
+        start = time.perf_counter_ns()
+        if self._ac3_result is not None:
+            success, self._ac3_result = self._ac3_result, None
+        else:
+            success = self.ac3()
+        time_ns["ac3"] = time.perf_counter_ns() - start
+        if self.tracer.level:
+            self.tracer.event("domains", solver=self)
+        return success
+
+    def _fixed_solution(self) -> Optional[Dict[Tuple[int, int], int]]:
+        # The solution when every domain is down to one value
+        if all(d & (d - 1) == 0 for d in self.domains.values()):
+            return {var: d.bit_length() - 1 for var, d in self.domains.items()}
+        return None
+
+    def _solve_tensor(self, algorithm: str, time_ns: Dict[str, int], timeout: Optional[float]):
+        """Run 'algorithm' on the NumPy tensor backend (see tensor_backend.py)."""
+        from tensor_backend import TensorSolver  # numpy is only needed here
+        if algorithm not in ("ac3", "ac3+backtracking", "backtracking"):
+            raise ValueError(f"Unknown algorithm for the numpy backend: {algorithm}")
+        tensor = TensorSolver(self.n, self.groups, self.table_limit)
+        stats = self.stats if self.stats is not None else SolverStats()
+        start = time.perf_counter_ns()
+        with stats.phase("ac3"):
+            success = tensor.propagate()
+        time_ns["ac3"] = time.perf_counter_ns() - start
+        # Mirror the propagated domains so domain_values() reflects them
+        self.domains = tensor.masks()
+        self._trail = []
+        self._clear_reasons()
+        self._reset_buckets({})
+        domains = None
+        if algorithm != "backtracking":
+            domains = self._snapshot()
+            if self.tracer.level:
+                self.tracer.event("domains", solver=self)
+        if not success:
+            return "unsat", None, domains
+        if algorithm == "ac3":
+            solution = self._fixed_solution()
+            return ("solved" if solution else "incomplete"), solution, domains
+        # The timeout covers the search only, so its clock starts here
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        start = time.perf_counter_ns()
+        with stats.phase("search"):
+            solution = tensor.search(deadline=deadline)
+        time_ns["search"] = time.perf_counter_ns() - start
+        stats.nodes += tensor.nodes
+        if solution is not None:
+            return "solved", solution, domains
+        return ("timeout" if tensor.status == "paused" else "unsat"), None, domains
+
+    def _solve_bitmask(self, algorithm: str, time_ns: Dict[str, int], timeout: Optional[float]):
+        domains = None
+        if algorithm in ("ac3", "ac3+backtracking"):
+            success = self._timed_ac3(time_ns)
+            domains = self._snapshot()
+            if not success:
+                return "unsat", None, domains
+            if algorithm == "ac3":
+                solution = self._fixed_solution()
+                return ("solved" if solution else "incomplete"), solution, domains
+        elif algorithm == "portfolio":
+            from parallel import solve_portfolio  # parallel imports this module
+            status, solution, config = solve_portfolio(self.n, self.groups, timeout=timeout)
+            if config is not None and self.tracer.level:
+                self.tracer.event("portfolio", config=config)
+            return status, solution, None
+        elif algorithm == "parallel":
+            from parallel import solve_split
+            status, solution = solve_split(self.n, self.groups, timeout=timeout,
+                                           queue_factory=self.queue_factory,
+                                           all_different=self.all_different,
+                                           table_limit=self.table_limit, tie_break=self.tie_break,
+                                           backjumping=self.backjumping,
+                                           nogood_limit=self.nogood_limit,
+                                           var_order=self.var_order, seed=self.seed,
+                                           value_order=self.value_order,
+                                           shuffle_values=self.shuffle_values)
+            return status, solution, None
+        elif algorithm not in ("backtracking", "backtracking_no_fc"):
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+        forward_checking = algorithm != "backtracking_no_fc"
+        if self.restarts is not None:
+            engine = RestartSearch(self, forward_checking)
+        else:
+            engine = SearchEngine(self, forward_checking)
+        # The timeout covers the search only, so its clock starts after AC-3
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        start = time.perf_counter_ns()
+        solution = engine.run(deadline=deadline)
+        time_ns["search"] = time.perf_counter_ns() - start
+        if solution is not None:
+            return "solved", solution, domains
+        return ("timeout" if engine.status == "paused" else "unsat"), None, domains
+
+    def solve_result(self, algorithm: str = "ac3+backtracking", backend: str = "bitmask",
+                     tracer: Optional[Tracer] = None, timeout: Optional[float] = None) -> SolveResult:
+        """
+        Solve the puzzle and describe the outcome as a SolveResult. Nothing is
+        printed; diagnostics go to 'tracer' (see tracing.py), which is off by
+        default. 'timeout' bounds the search in seconds; AC-3 runs to
+        completion first. Algorithms are those of solve().
+        """
+        self.tracer = tracer if tracer is not None else NULL_TRACER
+        if self.tracer.level:
+            self.tracer.event("start", algorithm=algorithm, backend=backend)
+        time_ns: Dict[str, int] = {}
+        start = time.perf_counter_ns()
+        if backend == "numpy":
+            status, solution, domains = self._solve_tensor(algorithm, time_ns, timeout)
+        elif backend == "bitmask":
+            status, solution, domains = self._solve_bitmask(algorithm, time_ns, timeout)
+        else:
+            raise ValueError(f"Unknown backend: {backend}")
+        time_ns["total"] = time.perf_counter_ns() - start
+        result = SolveResult(algorithm, status, solution, domains, time_ns)
+        if self.tracer.level:
+            self.tracer.event("finish", result=result)
+        return result
+
+    def solve(self, algorithm: str = "ac3+backtracking", backend: str = "bitmask",
+              tracer: Optional[Tracer] = None) -> Optional[Dict[Tuple[int, int], int]]:
         """
         Solve the puzzle using different algorithms:
         - "ac3": run AC3 only
         - "ac3+backtracking": run AC3, then backtracking
         - "backtracking": standard backtracking only
         - "backtracking_no_forward_check": backtracking without forward checking
-        """
+        - "portfolio": race several strategies in parallel processes, first answer wins
+        - "parallel": split one search tree across worker processes
 
-        print(f"Solving with {algorithm}...")
+        backend="numpy" runs "ac3", "ac3+backtracking" and "backtracking" on
+        an n×n×n boolean tensor instead of the per-cell bitmasks.
+
+        Returns the solution (for "ac3": whether AC-3 succeeded). Use
+        solve_result() for the status, domains and timings; pass
+        tracer=PrintTracer() for the progress output.
+        """
+        result = self.solve_result(algorithm, backend, tracer)
         if algorithm == "ac3":
-            success = self.ac3()
-            print("\nDomains after AC3:")
-            for i in range(self.n):
-                for j in range(self.n):
-                    print(f"Cell ({i},{j}): {sorted(self.domains[(i,j)])}")
-            return success
-        
-        if algorithm == "ac3+backtracking":
-            if self.ac3():
-                print("\nDomains after AC3:")
-                for i in range(self.n):
-                    for j in range(self.n):
-                        print(f"Cell ({i},{j}): {sorted(self.domains[(i,j)])}")
-                return self.backtrack()
-            return None
-        elif algorithm == "backtracking":
-            return self.backtrack()
-        elif algorithm == "backtracking_no_fc":
-            return self.backtrack_no_forward_check()
-        else:
-            raise ValueError(f"Unknown algorithm: {algorithm}")
\ No newline at end of file
+            return result.status != "unsat"
+        return result.solution
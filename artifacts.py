@@ -0,0 +1,127 @@
+"""
+Precompiled puzzle artifacts.
+
+Compiling a puzzle builds an ArithmeticPuzzleSolver (constraint graph, cage
+tuple tables, MRV buckets) and runs AC-3 on it; the artifact is that solver
+serialized. Loading an artifact skips both construction and the root AC-3:
+the next solve starts searching straight away.
+
+ArtifactCache keeps artifacts on disk under a content hash of the puzzle
+and the solver options, evicting the least recently used files once the
+directory grows past max_bytes:
+
+    cache = ArtifactCache(".puzzle-cache", max_bytes=64 * 2**20)
+    solver = cache.solver(n, groups)      # compiled once, loaded afterwards
+    solution = solver.solve()
+
+Artifacts are pickles, so only point a cache at a directory you trust.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from typing import Optional, Tuple
+
+from arithmetic_puzzle import ArithmeticPuzzleSolver
+from stats import SolverStats
+
+# Bump when the solver's internals change shape, to orphan old artifacts
+FORMAT_VERSION = 3
+
+
+def puzzle_key(n: int, groups, **solver_options) -> str:
+    """Content hash of a puzzle and the options it is compiled with (cage order is ignored)."""
+    cages = sorted((op, target, sorted(cells)) for cells, op, target in groups)
+    options = {k: getattr(v, "__qualname__", v) for k, v in sorted(solver_options.items())
+               if k != "stats"}
+    payload = json.dumps([FORMAT_VERSION, n, cages, options], separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def compile_puzzle(n: int, groups, **solver_options) -> bytes:
+    """Build a solver, run AC-3 and serialize the result."""
+    solver = ArithmeticPuzzleSolver(n, groups, **solver_options)
+    solver._ac3_result = solver.ac3()
+    if solver.stats is not None:
+        solver.stats.reset()
+    return pickle.dumps(solver, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_artifact(data: bytes, stats: bool = True) -> ArithmeticPuzzleSolver:
+    """A ready-to-search solver from compile_puzzle output."""
+    solver = pickle.loads(data)
+    solver.stats = SolverStats() if stats else None
+    return solver
+
+
+class ArtifactCache:
+    """
+    Directory of compiled artifacts named by puzzle_key. File modification
+    times record use, so eviction drops the least recently used artifacts
+    first; writes go through a temporary file and an atomic rename, so
+    several processes can share one directory.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 2**20, suffix: str = ".pkl"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.suffix):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another process meanwhile
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def solver(self, n: int, groups, **solver_options) -> ArithmeticPuzzleSolver:
+        """The puzzle's solver, loaded from the cache or compiled and stored."""
+        key = puzzle_key(n, groups, **solver_options)
+        data = self.get(key)
+        if data is None:
+            self.misses += 1
+            data = compile_puzzle(n, groups, **solver_options)
+            self.put(key, data)
+        else:
+            self.hits += 1
+        return load_artifact(data, solver_options.get("stats", True))
+
+    def stats(self) -> Tuple[int, int]:
+        """(hits, misses) since this cache object was created."""
+        return self.hits, self.misses
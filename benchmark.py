@@ -0,0 +1,176 @@
+"""
+Reproducible benchmarks for ArithmeticPuzzleSolver.
+
+Every trial builds a fresh solver (so no trial starts from domains pruned by
+an earlier one), runs the algorithm through the silent solve_result path and
+times only the solve with time.perf_counter_ns. Warm-up runs are discarded.
+
+    python benchmark.py --corpus examples --trials 10 --json results.json
+    python benchmark.py --corpus generated:9:20 --baseline results.json --threshold 0.1
+
+With --baseline, a case whose median time grew by more than the threshold
+(a fraction, 0.1 = 10%) is reported as a regression and the exit status is 1.
+"""
+import argparse
+import csv
+import json
+import statistics
+import sys
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from arithmetic_puzzle import ArithmeticPuzzleSolver
+
+Puzzle = Tuple[int, list]
+
+ALGORITHMS = ["ac3", "ac3+backtracking", "backtracking", "backtracking_no_fc"]
+
+
+class BenchmarkResult(NamedTuple):
+    """Timings (ns) of one puzzle/algorithm pair, warm-up runs excluded."""
+    puzzle: str
+    n: int
+    algorithm: str
+    times_ns: List[int]
+
+    @property
+    def best_ns(self) -> int:
+        return min(self.times_ns)
+
+    @property
+    def worst_ns(self) -> int:
+        return max(self.times_ns)
+
+    @property
+    def mean_ns(self) -> float:
+        return statistics.fmean(self.times_ns)
+
+    @property
+    def median_ns(self) -> float:
+        return statistics.median(self.times_ns)
+
+    def as_dict(self) -> dict:
+        return {
+            "puzzle": self.puzzle, "n": self.n, "algorithm": self.algorithm,
+            "trials": len(self.times_ns), "best_ns": self.best_ns,
+            "worst_ns": self.worst_ns, "mean_ns": self.mean_ns,
+            "median_ns": self.median_ns, "times_ns": self.times_ns,
+        }
+
+
+def time_solve(n: int, groups, algorithm: str, solver_options: Optional[dict] = None) -> int:
+    """Nanoseconds one fresh solver takes to run 'algorithm' (construction excluded)."""
+    solver = ArithmeticPuzzleSolver(n, groups, **(solver_options or {}))
+    start = time.perf_counter_ns()
+    solver.solve_result(algorithm)
+    return time.perf_counter_ns() - start
+
+
+def run_benchmark(corpus: Dict[str, Puzzle], algorithms: Iterable[str] = ("ac3+backtracking",),
+                  trials: int = 10, warmup: int = 1,
+                  solver_options: Optional[dict] = None) -> List[BenchmarkResult]:
+    """Time every algorithm on every puzzle of 'corpus' (name -> (n, groups))."""
+    results = []
+    for name, (n, groups) in corpus.items():
+        for algorithm in algorithms:
+            for _ in range(warmup):
+                time_solve(n, groups, algorithm, solver_options)
+            times = [time_solve(n, groups, algorithm, solver_options) for _ in range(trials)]
+            results.append(BenchmarkResult(name, n, algorithm, times))
+    return results
+
+
+def example_corpus() -> Dict[str, Puzzle]:
+    """The four hand-written puzzles from example.py."""
+    import example
+    return {
+        "groups1": (example.n1, example.groups1),
+        "groups2": (example.n2, example.groups2),
+        "groups3": (example.n3, example.groups3),
+        "groups4": (example.n4, example.groups4),
+    }
+
+
+def generated_corpus(n: int, count: int, seed: int = 0) -> Dict[str, Puzzle]:
+    """'count' generated n×n puzzles; the same seed always gives the same corpus."""
+    from generator import generate_puzzle
+    corpus = {}
+    for k in range(seed, seed + count):
+        puzzle = generate_puzzle(n, k)
+        corpus[f"gen{n}-{k}"] = (puzzle.n, puzzle.groups)
+    return corpus
+
+
+def load_corpus(spec: str) -> Dict[str, Puzzle]:
+    """'examples' or 'generated:<n>:<count>[:<seed>]'."""
+    if spec == "examples":
+        return example_corpus()
+    kind, *args = spec.split(":")
+    if kind == "generated" and len(args) in (2, 3):
+        return generated_corpus(*(int(a) for a in args))
+    raise ValueError(f"Unknown corpus: {spec}")
+
+
+def write_json(results: List[BenchmarkResult], path: str) -> None:
+    with open(path, "w") as f:
+        json.dump([r.as_dict() for r in results], f, indent=2)
+
+
+def write_csv(results: List[BenchmarkResult], path: str) -> None:
+    fields = ["puzzle", "n", "algorithm", "trials", "best_ns", "worst_ns", "mean_ns", "median_ns"]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for r in results:
+            writer.writerow(r.as_dict())
+
+
+def compare(results: List[BenchmarkResult], baseline: List[dict],
+            threshold: float = 0.1) -> List[Tuple[BenchmarkResult, float]]:
+    """
+    Regressions against a baseline written by write_json: the results whose
+    median exceeds the baseline median by more than 'threshold', with their
+    slowdown ratio. Cases missing from the baseline are skipped.
+    """
+    medians = {(b["puzzle"], b["algorithm"]): b["median_ns"] for b in baseline}
+    regressions = []
+    for r in results:
+        old = medians.get((r.puzzle, r.algorithm))
+        if old and r.median_ns > old * (1 + threshold):
+            regressions.append((r, r.median_ns / old))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", default="examples",
+                        help="examples or generated:<n>:<count>[:<seed>]")
+    parser.add_argument("--algorithms", nargs="+", default=["ac3+backtracking"], choices=ALGORITHMS)
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--json", help="write results as JSON")
+    parser.add_argument("--csv", help="write results as CSV")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(load_corpus(args.corpus), args.algorithms, args.trials, args.warmup)
+    for r in results:
+        print(f"{r.puzzle:>12} {r.algorithm:>20}  median {r.median_ns / 1e6:10.3f}ms"
+              f"  best {r.best_ns / 1e6:10.3f}ms  worst {r.worst_ns / 1e6:10.3f}ms")
+    if args.json:
+        write_json(results, args.json)
+    if args.csv:
+        write_csv(results, args.csv)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for r, ratio in regressions:
+            print(f"REGRESSION {r.puzzle} {r.algorithm}: {ratio:.2f}x baseline median")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
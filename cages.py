@@ -0,0 +1,126 @@
+"""
+Cage compilation for arithmetic puzzles.
+
+Each cage is turned into the table of value tuples that satisfy its
+operation, so support checks during propagation are lookups instead of a
+brute-force scan over the product of the cells' domains.
+"""
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+Cell = Tuple[int, int]
+
+
+def _sum_tuples(size: int, target: int, n: int) -> Tuple[Tuple[int, ...], ...]:
+    if size == 1:
+        return ((target,),) if 1 <= target <= n else ()
+    tuples = []
+    for v in range(1, n + 1):
+        rest = target - v
+        # The remaining cells must be able to reach 'rest'
+        if size - 1 <= rest <= (size - 1) * n:
+            tuples.extend((v,) + t for t in _sum_tuples(size - 1, rest, n))
+    return tuple(tuples)
+
+
+def _product_tuples(size: int, target: int, n: int) -> Tuple[Tuple[int, ...], ...]:
+    if size == 1:
+        return ((target,),) if 1 <= target <= n else ()
+    tuples = []
+    for v in range(1, n + 1):
+        if target % v == 0:
+            tuples.extend((v,) + t for t in _product_tuples(size - 1, target // v, n))
+    return tuple(tuples)
+
+
+@lru_cache(maxsize=None)
+def arithmetic_tuples(op: str, target: int, size: int, n: int) -> Optional[Tuple[Tuple[int, ...], ...]]:
+    """
+    All value tuples of length 'size' over 1..n that satisfy 'op' == target.
+
+    Returns None when the cage does not constrain its cells (sub/div on
+    anything other than two cells, which the solver leaves unchecked).
+    Results are memoized across puzzles.
+    """
+    if op == '':
+        return ((target,),) if size == 1 and 1 <= target <= n else ()
+    if op in ['add', '+']:
+        return _sum_tuples(size, target, n)
+    if op in ['mult', '*']:
+        return _product_tuples(size, target, n)
+    if size != 2:
+        return None
+    values = range(1, n + 1)
+    if op in ['sub', '-']:
+        return tuple((a, b) for a in values for b in values if abs(a - b) == target)
+    if op in ['div', '/']:
+        return tuple((a, b) for a in values for b in values
+                     if a == b * target or b == a * target)
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _distinct_tuples(op: str, target: int, size: int, n: int,
+                     conflicts: FrozenSet[Tuple[int, int]]) -> Optional[Tuple[Tuple[int, ...], ...]]:
+    # Drop tuples that repeat a value in two cells sharing a row or column
+    tuples = arithmetic_tuples(op, target, size, n)
+    if tuples is None or not conflicts:
+        return tuples
+    return tuple(t for t in tuples if all(t[i] != t[j] for i, j in conflicts))
+
+
+class CageTable:
+    """
+    Compiled cage: its cells in a fixed order and the value tuples that
+    satisfy both the cage arithmetic and row/column distinctness inside the
+    cage. A table of None means the cage does not constrain its cells.
+    """
+
+    def __init__(self, cells: Set[Cell], op: str, target: int, n: int):
+        self.cells = tuple(sorted(cells))
+        self.op = op
+        self.target = target
+        self.index = {cell: i for i, cell in enumerate(self.cells)}
+        conflicts = frozenset(
+            (i, j)
+            for i, a in enumerate(self.cells)
+            for j, b in enumerate(self.cells)
+            if i < j and (a[0] == b[0] or a[1] == b[1])
+        )
+        self.tuples = _distinct_tuples(op, target, len(self.cells), n, conflicts)
+        # each tuple as a tuple of value bits, for bitmask membership tests
+        self._bits = tuple(tuple(1 << v for v in t) for t in self.tuples or ())
+
+    def project(self, masks: List[int]) -> List[int]:
+        """
+        Generalized arc consistency in one pass: given the domain masks of
+        self.cells (in order), return for each cell the mask of values that
+        appear in some tuple lying entirely inside the current domains.
+        """
+        if self.tuples is None:
+            return list(masks)
+        supported = [0] * len(masks)
+        for bits in self._bits:
+            for m, b in zip(masks, bits):
+                if not m & b:
+                    break
+            else:
+                for i, b in enumerate(bits):
+                    supported[i] |= b
+                if supported == masks:
+                    break  # every remaining value already has support
+        return supported
+
+    def support_counts(self, masks: List[int], i: int) -> Dict[int, int]:
+        """
+        For cell i: value -> number of tuples lying entirely inside the
+        current domain masks of self.cells that give the cell that value.
+        """
+        counts: Dict[int, int] = {}
+        for t, bits in zip(self.tuples or (), self._bits):
+            for m, b in zip(masks, bits):
+                if not m & b:
+                    break
+            else:
+                counts[t[i]] = counts.get(t[i], 0) + 1
+        return counts
@@ -0,0 +1,339 @@
+"""
+Typed constraints and the indexed constraint graph used by
+ArithmeticPuzzleSolver.
+
+Every constraint works on domain bitmasks (bit v set when value v is still
+possible) and is shared by all the cells it covers, so building the graph
+allocates one object per row, column and cage rather than one closure per
+ordered cell pair.
+"""
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
+
+from cages import CageTable
+
+Cell = Tuple[int, int]
+
+
+@lru_cache(maxsize=1 << 16)
+def mask_values(mask: int) -> Tuple[int, ...]:
+    """Values present in a domain bitmask, in ascending order."""
+    values = []
+    while mask:
+        low = mask & -mask
+        values.append(low.bit_length() - 1)
+        mask ^= low
+    return tuple(values)
+
+
+class NotEqualConstraint:
+    """x != y between two cells of the same row or column."""
+    kind = 'not_equal'
+    cost = 1
+
+    def revise(self, xi: Cell, xj: Cell, domains: Dict[Cell, int]) -> int:
+        """New mask for xi: a value only loses support once xj is fixed to it."""
+        dj = domains[xj]
+        if dj & (dj - 1) == 0:
+            return domains[xi] & ~dj
+        return domains[xi]
+
+    def forward(self, var: Cell, value: int, neighbor: Cell, domains: Dict[Cell, int]) -> int:
+        """New mask for 'neighbor' once 'var' is assigned 'value'."""
+        return domains[neighbor] & ~(1 << value)
+
+
+# Row/column constraints carry no state, so every such arc shares this one.
+NOT_EQUAL = NotEqualConstraint()
+
+
+class AllDifferentConstraint:
+    """
+    All cells of one row or column take distinct values, filtered with
+    Regin's matching algorithm: a value is removed from a cell when no
+    maximum matching of cells to values can give it that value. This
+    catches naked and hidden subsets (Hall sets) as well as plain
+    singletons, long before the binary x != y arcs would.
+    """
+    kind = 'all_different'
+
+    def __init__(self, cells: List[Cell], n: int):
+        self.cells = tuple(cells)
+        self.n = n
+        self.cost = len(cells) * n
+        # Last matching found (cell index -> value); only a warm start for the
+        # next run, so it never needs undoing when the search backtracks.
+        self._match = [0] * len(cells)
+
+    def propagate(self, domains: Dict[Cell, int]) -> List[Tuple[Cell, int]]:
+        """
+        Prune the cells against each other. Returns the (cell, new mask)
+        pairs that changed; a zero mask is a wipeout.
+        """
+        old = [domains[c] for c in self.cells]
+        masks = list(old)
+        k = len(masks)
+
+        # Naked singles: fixed values leave every other cell, repeatedly
+        fixed = 0
+        open_cells = list(range(k))
+        while True:
+            still_open = []
+            newly_fixed = 0
+            for i in open_cells:
+                m = masks[i] & ~fixed
+                masks[i] = m
+                if not m:
+                    return [(self.cells[i], 0)]
+                if m & (m - 1):
+                    still_open.append(i)
+                elif newly_fixed & m:
+                    return [(self.cells[i], 0)]  # two cells fixed to one value
+                else:
+                    newly_fixed |= m
+            open_cells = still_open
+            if not newly_fixed:
+                break
+            fixed |= newly_fixed
+
+        if open_cells:
+            if not self._match_filter(masks, open_cells):
+                return [(self.cells[open_cells[0]], 0)]
+        return [(self.cells[i], masks[i]) for i in range(k) if masks[i] != old[i]]
+
+    def _match_filter(self, masks: List[int], cells: List[int]) -> bool:
+        """
+        Regin filtering of the unfixed cells (indices into masks), in place.
+        Returns False when the cells cannot all get distinct values.
+        """
+        count = len(cells)
+        cell_masks = [masks[i] for i in cells]
+        values = [mask_values(m) for m in cell_masks]
+        # Matching between positions p (cells[p]) and values, warm-started
+        # from the previous run
+        match = [self._match[i] for i in cells]
+        owner = [-1] * (self.n + 1)  # value -> position
+        for p in range(count):
+            v = match[p]
+            if v and cell_masks[p] >> v & 1 and owner[v] < 0:
+                owner[v] = p
+            else:
+                match[p] = 0
+
+        def augment(p: int, seen: set) -> bool:
+            for v in values[p]:
+                if v not in seen:
+                    seen.add(v)
+                    q = owner[v]
+                    if q < 0 or augment(q, seen):
+                        owner[v] = p
+                        match[p] = v
+                        return True
+            return False
+
+        for p in range(count):
+            if not match[p] and not augment(p, set()):
+                return False  # fewer values than cells (a Hall violation)
+        for p, i in enumerate(cells):
+            self._match[i] = match[p]
+
+        # Values that some alternating path from an unmatched value can free:
+        # every edge into them belongs to some maximum matching.
+        union = 0
+        matched = 0
+        for p in range(count):
+            union |= cell_masks[p]
+            matched |= 1 << match[p]
+        freeable = union & ~matched
+        grew = bool(freeable)
+        while grew:
+            grew = False
+            for p in range(count):
+                b = 1 << match[p]
+                if cell_masks[p] & freeable and not freeable & b:
+                    freeable |= b
+                    grew = True
+
+        # Residual graph on cells: p -> q when cell p could take q's matched
+        # value. An edge lies on an alternating cycle when q reaches p back,
+        # so reachability (bitset transitive closure) gives the SCCs.
+        reach = []
+        for p in range(count):
+            r = 0
+            for v in values[p]:
+                q = owner[v]
+                if q >= 0 and q != p:
+                    r |= 1 << q
+            reach.append(r)
+        for q in range(count):
+            bit = 1 << q
+            rq = reach[q]
+            for p in range(count):
+                if reach[p] & bit:
+                    reach[p] |= rq
+
+        for p, i in enumerate(cells):
+            keep = (1 << match[p]) | (cell_masks[p] & freeable)
+            for v in values[p]:
+                q = owner[v]
+                if q >= 0 and q != p and reach[q] >> p & 1:
+                    keep |= 1 << v
+            masks[i] = keep
+        return True
+
+
+class CageConstraint:
+    """
+    Cage arithmetic over all the cells of one group, propagated as a single
+    n-ary constraint (generalized arc consistency) from its CageTable.
+    """
+    kind = 'cage'
+
+    def __init__(self, table: CageTable):
+        self.table = table
+        self.cells = table.cells
+        # rough propagation cost: the number of tuples one pass may visit
+        self.cost = 1 + len(table.tuples or ())
+        # sub/div on more than two cells is left unchecked (see CageTable)
+        self.unconstrained = table.tuples is None
+
+    def propagate(self, domains: Dict[Cell, int]) -> List[Tuple[Cell, int]]:
+        """
+        Prune every cell of the cage against the others' current domains.
+        Returns the (cell, new mask) pairs that changed; a zero mask is a wipeout.
+        """
+        masks = [domains[c] for c in self.cells]
+        supported = self.table.project(masks)
+        return [(c, new) for c, old, new in zip(self.cells, masks, supported) if new != old]
+
+
+class BoundsCageConstraint:
+    """
+    Sum or product cage propagated by bounds reasoning instead of a tuple
+    table, for cages whose product space is too large to enumerate:
+    - add: every cell must fit target minus the others' min/max sums
+    - mult: every value must divide the target, and target / value must lie
+      within the others' min/max products
+    Cells fixed by the search have min == max, so the remaining target
+    tightens automatically as the cage fills up. Runs to a fixpoint.
+    """
+    kind = 'cage_bounds'
+    unconstrained = False
+
+    def __init__(self, cells: Set[Cell], op: str, target: int, n: int):
+        self.cells = tuple(sorted(cells))
+        self.op = op
+        self.target = target
+        self.is_sum = op in ['add', '+']
+        self.cost = len(self.cells) * n
+        # values that can take part in the cage at all
+        if self.is_sum:
+            self.allowed = ((1 << n) - 1) << 1
+        else:
+            self.allowed = sum(1 << v for v in range(1, n + 1) if target % v == 0)
+
+    def propagate(self, domains: Dict[Cell, int]) -> List[Tuple[Cell, int]]:
+        """
+        Prune every cell of the cage against the others' bounds.
+        Returns the (cell, new mask) pairs that changed; a zero mask is a wipeout.
+        """
+        old = [domains[c] for c in self.cells]
+        masks = [m & self.allowed for m in old]
+        target = self.target
+        changed = True
+        while changed:
+            changed = False
+            if not all(masks):
+                break
+            lo = [(m & -m).bit_length() - 1 for m in masks]
+            hi = [m.bit_length() - 1 for m in masks]
+            if self.is_sum:
+                total_lo = sum(lo)
+                total_hi = sum(hi)
+                for i, m in enumerate(masks):
+                    low = max(1, target - (total_hi - hi[i]))
+                    high = target - (total_lo - lo[i])
+                    window = ((1 << (high + 1)) - 1) & ~((1 << low) - 1) if low <= high else 0
+                    if m & window != m:
+                        masks[i] = m & window
+                        changed = True
+            else:
+                product_lo = 1
+                product_hi = 1
+                for a, b in zip(lo, hi):
+                    product_lo *= a
+                    product_hi *= b
+                for i, m in enumerate(masks):
+                    others_lo = product_lo // lo[i]
+                    others_hi = product_hi // hi[i]
+                    keep = 0
+                    for v in mask_values(m):
+                        if others_lo <= target // v <= others_hi:
+                            keep |= 1 << v
+                    if keep != m:
+                        masks[i] = keep
+                        changed = True
+        return [(c, new) for c, was, new in zip(self.cells, old, masks) if new != was]
+
+
+class ConstraintGraph:
+    """
+    Constraint network indexed for O(1) lookups:
+    - arcs[(xi, xj)]: binary constraints linking xi to xj
+    - neighbors[xi]: distinct cells sharing a binary constraint with xi
+    - watchers[xi]: n-ary propagators (rows, columns, cages) whose scope contains xi
+
+    all_different selects how rows and columns are modelled: "matching"
+    (default) uses one AllDifferentConstraint per row and column,
+    "pairwise" falls back to binary not-equal arcs between every pair.
+    """
+
+    def __init__(self, n: int, cages: List, all_different: str = "matching"):
+        self.n = n
+        cells = [(i, j) for i in range(n) for j in range(n)]
+        self.arcs: Dict[Tuple[Cell, Cell], List] = {}
+        self.neighbors: Dict[Cell, List[Cell]] = {cell: [] for cell in cells}
+        self.watchers: Dict[Cell, List] = {cell: [] for cell in cells}
+        self.cages = cages
+        self.lines: List[AllDifferentConstraint] = []
+
+        # Row and column constraints
+        if all_different == "matching":
+            for i in range(n):
+                self._add_propagator(AllDifferentConstraint([(i, j) for j in range(n)], n))
+                self._add_propagator(AllDifferentConstraint([(j, i) for j in range(n)], n))
+        elif all_different == "pairwise":
+            for i in range(n):
+                for j in range(n):
+                    for k in range(n):
+                        if k != j:
+                            self._add_arc((i, j), (i, k), NOT_EQUAL)
+                    for k in range(n):
+                        if k != i:
+                            self._add_arc((i, j), (k, j), NOT_EQUAL)
+        else:
+            raise ValueError(f"Unknown all_different mode: {all_different}")
+
+        # Group arithmetic constraints
+        for cage in self.cages:
+            if cage.unconstrained:
+                continue  # nothing to propagate
+            self._add_propagator(cage)
+
+    def propagators(self) -> List:
+        """Every n-ary propagator: row/column all-different, then constraining cages."""
+        return self.lines + [cage for cage in self.cages if not cage.unconstrained]
+
+    def _add_propagator(self, constraint) -> None:
+        if isinstance(constraint, AllDifferentConstraint):
+            self.lines.append(constraint)
+        for cell in constraint.cells:
+            self.watchers[cell].append(constraint)
+
+    def _add_arc(self, xi: Cell, xj: Cell, constraint) -> None:
+        arc = self.arcs.get((xi, xj))
+        if arc is None:
+            self.arcs[(xi, xj)] = [constraint]
+            self.neighbors[xi].append(xj)
+        else:
+            arc.append(constraint)
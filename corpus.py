@@ -0,0 +1,263 @@
+"""
+On-disk puzzle corpora.
+
+Two formats hold one puzzle per record:
+
+- JSONL, one object per line:
+      {"id": "p1", "n": 4, "cages": [["mult", 24, [0, 0, 0, 1, 1, 0]], ["", 2, [3, 3]]]}
+  Each cage is [op, target, cells] with the cells flattened to
+  row, column pairs. "id" is optional.
+- Binary: the MAGIC header, then per puzzle a little-endian record
+      u32 length of the rest | u8 n | u16 cage count |
+      u16 id length (0xFFFF: no id) | id as UTF-8 |
+      per cage: u8 op code | u32 target | u8 size | size × u16 cell (row * n + col)
+  Files from before ids were stored (MAGIC_V1, no id fields) still read.
+
+iter_puzzles streams either format (detected from the header) from a file,
+which is memory-mapped by default, or from stdin, without reading the whole
+corpus, so it can feed parallel.solve_many directly:
+
+    with SolutionWriter("solutions.jsonl") as out:
+        for result in solve_many(iter_puzzles("corpus.bin")):
+            out.write(result.index, result.status, result.solution, id=result.id)
+
+From the command line:
+
+    python corpus.py solve corpus.jsonl -o solutions.jsonl --workers 8
+    python corpus.py convert corpus.jsonl corpus.bin
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from itertools import chain
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+Cell = Tuple[int, int]
+Group = Tuple[Set[Cell], str, int]
+
+MAGIC = b"KKPZ\x02"
+MAGIC_V1 = b"KKPZ\x01"
+OPS = ['', 'add', 'sub', 'mult', 'div']
+# The solver also accepts the symbolic spellings
+_OP_CODES = {op: code for code, op in enumerate(OPS)}
+_OP_CODES.update({'+': 1, '-': 2, '*': 3, '/': 4})
+
+_RECORD = struct.Struct("<IBHH")
+_RECORD_V1 = struct.Struct("<IBH")
+_CAGE = struct.Struct("<BIB")
+_NO_ID = 0xFFFF
+
+
+class CorpusPuzzle(NamedTuple):
+    """One puzzle of a corpus; unpacks like the (n, groups) pairs solve_many takes."""
+    n: int
+    groups: List[Group]
+    id: Optional[str] = None
+
+
+def encode_json(n: int, groups: Iterable[Group], id: Optional[str] = None) -> str:
+    """One JSONL line (without the newline) for a puzzle."""
+    cages = [[OPS[_OP_CODES[op]], target, [x for cell in sorted(cells) for x in cell]]
+             for cells, op, target in groups]
+    record = {"n": n, "cages": cages}
+    if id is not None:
+        record = {"id": id, **record}
+    return json.dumps(record, separators=(",", ":"))
+
+
+def decode_json(line: Union[str, bytes]) -> CorpusPuzzle:
+    record = json.loads(line)
+    groups = [({(flat[k], flat[k + 1]) for k in range(0, len(flat), 2)}, op, target)
+              for op, target, flat in record["cages"]]
+    return CorpusPuzzle(record["n"], groups, record.get("id"))
+
+
+def encode_binary(n: int, groups: Iterable[Group], id: Optional[str] = None) -> bytes:
+    """One binary record (length prefix included) for a puzzle."""
+    body = bytearray()
+    if id is not None:
+        body += id.encode()
+        if len(body) >= _NO_ID:
+            raise ValueError(f"Puzzle id too long for the binary format: {id[:40]}...")
+    id_length = len(body) if id is not None else _NO_ID
+    count = 0
+    for cells, op, target in groups:
+        body += _CAGE.pack(_OP_CODES[op], target, len(cells))
+        body += struct.pack(f"<{len(cells)}H", *(i * n + j for i, j in sorted(cells)))
+        count += 1
+    return _RECORD.pack(len(body) + _RECORD.size - 4, n, count, id_length) + bytes(body)
+
+
+def _decode_binary(buffer, offset: int, version: bytes = MAGIC) -> Tuple[CorpusPuzzle, int]:
+    # Parse the record at 'offset'; returns it and the next record's offset
+    id = None
+    if version == MAGIC_V1:
+        length, n, count = _RECORD_V1.unpack_from(buffer, offset)
+        pos = offset + _RECORD_V1.size
+    else:
+        length, n, count, id_length = _RECORD.unpack_from(buffer, offset)
+        pos = offset + _RECORD.size
+        if id_length != _NO_ID:
+            id = bytes(buffer[pos:pos + id_length]).decode()
+            pos += id_length
+    end = offset + 4 + length
+    groups = []
+    for _ in range(count):
+        code, target, size = _CAGE.unpack_from(buffer, pos)
+        pos += _CAGE.size
+        cells = struct.unpack_from(f"<{size}H", buffer, pos)
+        pos += 2 * size
+        groups.append(({divmod(c, n) for c in cells}, OPS[code], target))
+    return CorpusPuzzle(n, groups, id), end
+
+
+def _iter_binary_buffer(buffer, offset: int, version: bytes) -> Iterator[CorpusPuzzle]:
+    while offset < len(buffer):
+        puzzle, offset = _decode_binary(buffer, offset, version)
+        yield puzzle
+
+
+def _iter_binary_stream(stream: BinaryIO, version: bytes) -> Iterator[CorpusPuzzle]:
+    while True:
+        head = stream.read(4)
+        if not head:
+            return
+        (length,) = struct.unpack("<I", head)
+        puzzle, _ = _decode_binary(head + stream.read(length), 0, version)
+        yield puzzle
+
+
+def _iter_json_lines(lines: Iterable[bytes]) -> Iterator[CorpusPuzzle]:
+    for line in lines:
+        if line.strip():
+            yield decode_json(line)
+
+
+def iter_puzzles(source: Union[str, BinaryIO] = "-", use_mmap: bool = True) -> Iterator[CorpusPuzzle]:
+    """
+    Stream the puzzles of a JSONL or binary corpus. 'source' is a path, "-"
+    for stdin, or a binary file object. Files are memory-mapped unless
+    use_mmap is False; either way only the current record is decoded.
+    """
+    if source == "-":
+        yield from _iter_stream(sys.stdin.buffer)
+        return
+    if not isinstance(source, str):
+        yield from _iter_stream(source)
+        return
+    with open(source, "rb") as f:
+        if not use_mmap or os.fstat(f.fileno()).st_size == 0:
+            yield from _iter_stream(f)
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(MAGIC)] in (MAGIC, MAGIC_V1):
+                yield from _iter_binary_buffer(mm, len(MAGIC), mm[:len(MAGIC)])
+            else:
+                yield from _iter_json_lines(iter(mm.readline, b""))
+
+
+def _iter_stream(stream: BinaryIO) -> Iterator[CorpusPuzzle]:
+    # Pipes cannot seek, so the sniffed header is put back in front by hand
+    head = stream.read(len(MAGIC))
+    if head in (MAGIC, MAGIC_V1):
+        yield from _iter_binary_stream(stream, head)
+    else:
+        first = (head + stream.readline()).splitlines()
+        yield from _iter_json_lines(chain(first, stream))
+
+
+def write_puzzles(puzzles: Iterable, dest: Union[str, BinaryIO], binary: bool = False) -> int:
+    """
+    Stream puzzles ((n, groups) pairs or CorpusPuzzle) to a path or binary
+    file object. Returns the number written.
+    """
+    out = open(dest, "wb") if isinstance(dest, str) else dest
+    count = 0
+    try:
+        if binary:
+            out.write(MAGIC)
+        for puzzle in puzzles:
+            n, groups = puzzle[0], puzzle[1]
+            id = getattr(puzzle, "id", None)
+            if binary:
+                out.write(encode_binary(n, groups, id))
+            else:
+                out.write(encode_json(n, groups, id).encode() + b"\n")
+            count += 1
+    finally:
+        if isinstance(dest, str):
+            out.close()
+        else:
+            out.flush()
+    return count
+
+
+class SolutionWriter:
+    """
+    Streams solutions as JSONL, one object per puzzle:
+        {"index": 0, "id": "p1", "status": "solved", "solution": [[1, 2], [2, 1]]}
+    "solution" is the grid row by row, or null. dest is a path or a text
+    stream ("-" or None for stdout).
+    """
+
+    def __init__(self, dest=None):
+        self._own = isinstance(dest, str) and dest != "-"
+        self.out = open(dest, "w") if self._own else (sys.stdout if dest in (None, "-") else dest)
+
+    def write(self, index: int, status: str, solution: Optional[Dict[Cell, int]],
+              id: Optional[str] = None, **extra) -> None:
+        grid = None
+        if solution:
+            n = max(i for i, _ in solution) + 1
+            grid = [[solution[(i, j)] for j in range(n)] for i in range(n)]
+        record = {"index": index}
+        if id is not None:
+            record["id"] = id
+        record.update(status=status, solution=grid, **extra)
+        self.out.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        if self._own:
+            self.out.close()
+        else:
+            self.out.flush()
+
+    def __enter__(self) -> "SolutionWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Solve or convert puzzle corpora.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    solve = commands.add_parser("solve", help="solve a corpus, streaming JSONL solutions")
+    solve.add_argument("source", nargs="?", default="-", help="corpus path or - for stdin")
+    solve.add_argument("-o", "--output", default="-")
+    solve.add_argument("--algorithm", default="ac3+backtracking")
+    solve.add_argument("--workers", type=int)
+    solve.add_argument("--timeout", type=float, help="seconds of search per puzzle (setup and AC-3 not included)")
+    convert = commands.add_parser("convert", help="rewrite a corpus as JSONL or binary")
+    convert.add_argument("source")
+    convert.add_argument("dest")
+    convert.add_argument("--jsonl", action="store_true", help="write JSONL (default: binary)")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        write_puzzles(iter_puzzles(args.source), args.dest, binary=not args.jsonl)
+        return 0
+    from parallel import solve_many
+    with SolutionWriter(args.output) as out:
+        for result in solve_many(iter_puzzles(args.source), args.algorithm,
+                                 workers=args.workers, timeout=args.timeout):
+            out.write(result.index, result.status, result.solution, id=result.id,
+                      elapsed=round(result.elapsed, 6))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
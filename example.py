@@ -1,4 +1,5 @@
 from arithmetic_puzzle import ArithmeticPuzzleSolver
+from tracing import PrintTracer
 import time
 import numpy as np
 
@@ -107,9 +108,9 @@ def main():
     
     algorithm = 'ac3+backtracking'
     solver = ArithmeticPuzzleSolver(n4, groups4)
-    start_time = time.time()
-    solution = solver.solve(algorithm)
-    print(f"Time taken: {time.time() - start_time:.8f} seconds")
+    start_time = time.perf_counter()
+    solution = solver.solve(algorithm, tracer=PrintTracer())
+    print(f"Time taken: {time.perf_counter() - start_time:.8f} seconds")
 
     if algorithm == 'ac3':
         pass
@@ -227,25 +228,20 @@ groups4 = [
 ]
 
 
-# TODO: write a function to run each problem 10 times for each algorithm and record the best/worst/average time, then plot the results
-def run_experiment():
-    algorithms = ['ac3+backtracking', 'backtracking_no_fc']
-    problems = [(n1, groups1), (n2, groups2), (n3, groups3)]
+def run_experiment(trials: int = 10, algorithms=('ac3+backtracking', 'backtracking_no_fc')):
+    """
+    Time each example puzzle 'trials' times per algorithm (fresh solver per
+    trial, one warm-up run; see benchmark.py) and return
+    ({(n, algorithm): (best, worst, average)}, {(n, algorithm): times}) in seconds.
+    """
+    from benchmark import example_corpus, run_benchmark
+
     results = {}
     raw_results = {}
-    for n, groups in problems:
-        for algorithm in algorithms:
-            solver = ArithmeticPuzzleSolver(n, groups)
-            times = []
-            for i in range(10):
-                start_time = time.time()
-                solution = solver.solve(algorithm)
-                times.append(time.time() - start_time)
-            best_time = min(times)
-            worst_time = max(times)
-            avg_time = sum(times) / len(times)
-            results[(n, algorithm)] = (best_time, worst_time, avg_time)
-            raw_results[(n, algorithm)] = times
+    for r in run_benchmark(example_corpus(), algorithms, trials=trials, warmup=1):
+        times = [ns / 1e9 for ns in r.times_ns]
+        results[(r.n, r.algorithm)] = (min(times), max(times), sum(times) / len(times))
+        raw_results[(r.n, r.algorithm)] = times
     return results, raw_results
 
 
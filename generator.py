@@ -0,0 +1,268 @@
+"""
+Puzzle generation for ArithmeticPuzzleSolver.
+
+A puzzle is built in four steps:
+- latin_square: a random n×n Latin square (the intended solution)
+- partition_cages: a random split of the grid into connected cages
+- cage_operation: an operation and target for each cage, read off the square
+- make_unique: split cages until the solver finds no second solution
+
+Splitting a cage into parts that keep its operation (or into given cells)
+only ever removes solutions, so each round of make_unique starts from the
+previous round's AC-3 domains instead of propagating from full domains.
+
+generate_many streams puzzles from a process pool:
+
+    from generator import generate_many
+
+    for puzzle in generate_many(500, 9, workers=8):
+        print(puzzle.seed, len(puzzle.groups))
+"""
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import count, islice
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from arithmetic_puzzle import ArithmeticPuzzleSolver
+from search import SearchEngine
+
+Cell = Tuple[int, int]
+Group = Tuple[Set[Cell], str, int]
+
+
+class GeneratedPuzzle(NamedTuple):
+    """A puzzle with exactly one solution, in the solver's (n, groups) format."""
+    n: int
+    groups: List[Group]
+    solution: Dict[Cell, int]
+    seed: int
+
+
+def latin_square(n: int, rng: random.Random) -> Dict[Cell, int]:
+    """
+    Random Latin square, filled row by row: each row is a random perfect
+    matching between columns and the values their column has not used yet
+    (a Latin rectangle always extends, so this never gets stuck).
+    """
+    unused = [set(range(1, n + 1)) for _ in range(n)]  # per column
+    grid = {}
+    for i in range(n):
+        owner: Dict[int, int] = {}  # value -> column
+
+        def augment(col: int, seen: set) -> bool:
+            values = list(unused[col])
+            rng.shuffle(values)
+            for v in values:
+                if v not in seen:
+                    seen.add(v)
+                    if v not in owner or augment(owner[v], seen):
+                        owner[v] = col
+                        return True
+            return False
+
+        columns = list(range(n))
+        rng.shuffle(columns)
+        for col in columns:
+            augment(col, set())
+        for v, col in owner.items():
+            grid[(i, col)] = v
+            unused[col].discard(v)
+    return grid
+
+
+def _neighbours(cell: Cell, n: int) -> List[Cell]:
+    i, j = cell
+    return [(a, b) for a, b in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1))
+            if 0 <= a < n and 0 <= b < n]
+
+
+def partition_cages(n: int, rng: random.Random, max_size: int = 4,
+                    single_rate: float = 0.05) -> List[List[Cell]]:
+    """
+    Cover the grid with connected cages of 1..max_size cells, grown from
+    random seeds; about 'single_rate' of the cages are single cells.
+    """
+    free = {(i, j) for i in range(n) for j in range(n)}
+    starts = sorted(free)
+    rng.shuffle(starts)
+    cages = []
+    for start in starts:
+        if start not in free:
+            continue
+        size = 1 if rng.random() < single_rate else rng.randint(2, max(2, max_size))
+        cage = [start]
+        free.discard(start)
+        while len(cage) < size:
+            frontier = [c for cell in cage for c in _neighbours(cell, n) if c in free]
+            if not frontier:
+                break
+            cell = rng.choice(frontier)
+            cage.append(cell)
+            free.discard(cell)
+        cages.append(cage)
+    return cages
+
+
+def cage_operation(values: List[int], rng: random.Random) -> Tuple[str, int]:
+    """Pick an operation for a cage holding 'values' and return (op, target)."""
+    if len(values) == 1:
+        return '', values[0]
+    if len(values) == 2:
+        small, large = sorted(values)
+        ops = ['add', 'mult', 'sub']
+        if large % small == 0:
+            ops += ['div', 'div']  # rarer than the others, so favour it
+        op = rng.choice(ops)
+        if op == 'sub':
+            return op, large - small
+        if op == 'div':
+            return op, large // small
+    else:
+        op = rng.choice(['add', 'mult'])
+    if op == 'add':
+        return op, sum(values)
+    product = 1
+    for v in values:
+        product *= v
+    return op, product
+
+
+def _group(cells, op: str, solution: Dict[Cell, int]) -> Group:
+    # A cage labelled with 'op' (add/mult) or a given cell
+    values = [solution[c] for c in cells]
+    if len(values) == 1:
+        return {cells[0]}, '', values[0]
+    if op == 'add':
+        return set(cells), op, sum(values)
+    product = 1
+    for v in values:
+        product *= v
+    return set(cells), op, product
+
+
+def _components(cells: Set[Cell], n: int) -> List[List[Cell]]:
+    parts, left = [], set(cells)
+    while left:
+        stack = [left.pop()]
+        part = []
+        while stack:
+            cell = stack.pop()
+            part.append(cell)
+            for c in _neighbours(cell, n):
+                if c in left:
+                    left.discard(c)
+                    stack.append(c)
+        parts.append(sorted(part))
+    return parts
+
+
+def _split(group: Group, cell: Cell, solution: Dict[Cell, int], n: int,
+           rng: random.Random) -> List[Group]:
+    """
+    Split a cage so that 'cell' ends up in a smaller cage. add/mult parts
+    keep the cage's operation, so the new cages imply the old one; two-cell
+    and sub/div cages become given cells.
+    """
+    cells, op, _ = group
+    if len(cells) <= 2 or op not in ('add', 'mult'):
+        return [({c}, '', solution[c]) for c in sorted(cells)]
+    part = [cell]
+    while len(part) < len(cells) // 2:
+        frontier = [c for p in part for c in _neighbours(p, n) if c in cells and c not in part]
+        if not frontier:
+            break
+        part.append(rng.choice(frontier))
+    rest = _components(cells - set(part), n)
+    return [_group(p, op, solution) for p in [part] + rest]
+
+
+def make_unique(n: int, groups: List[Group], solution: Dict[Cell, int],
+                rng: random.Random, node_limit: int = 20_000) -> List[Group]:
+    """
+    Refine 'groups' until 'solution' is the only solution. Each round looks
+    for a second solution (within 'node_limit' search nodes) and splits a
+    cage holding a cell where the two differ; when the search runs out of
+    budget the largest cage is split instead. A split only removes
+    solutions, so the next round starts from this round's AC-3 domains.
+    """
+    groups = list(groups)
+    domains = None
+    while True:
+        solver = ArithmeticPuzzleSolver(n, groups)
+        if domains is not None:
+            for var, mask in domains.items():
+                solver.domains[var] &= mask
+        if not solver.ac3():
+            raise ValueError("cage targets do not match the solution")
+        domains = dict(solver.domains)
+        engine = SearchEngine(solver)
+        other = None
+        while engine.nodes < node_limit:
+            found = engine.run(node_limit=node_limit - engine.nodes)
+            if found is None:
+                break
+            if found != solution:
+                other = found
+                break
+        if other is None and engine.status == "exhausted":
+            return groups
+        if other is not None:
+            cell = rng.choice([c for c in solution if other[c] != solution[c]])
+            index = next(k for k, g in enumerate(groups) if cell in g[0])
+        else:
+            index = max(range(len(groups)), key=lambda k: len(groups[k][0]))
+            cell = rng.choice(sorted(groups[index][0]))
+        groups[index:index + 1] = _split(groups[index], cell, solution, n, rng)
+
+
+def generate_puzzle(n: int, seed: Optional[int] = None, max_cage: int = 4,
+                    node_limit: int = 20_000) -> GeneratedPuzzle:
+    """Generate one puzzle with a unique solution; the same seed gives the same puzzle."""
+    rng = random.Random(seed)
+    solution = latin_square(n, rng)
+    groups = []
+    for cells in partition_cages(n, rng, max_cage):
+        op, target = cage_operation([solution[c] for c in cells], rng)
+        groups.append((set(cells), op, target))
+    groups = make_unique(n, groups, solution, rng, node_limit)
+    return GeneratedPuzzle(n, groups, solution, seed)
+
+
+def _generate_chunk(n: int, seeds: List[int], max_cage: int,
+                    node_limit: int) -> List[GeneratedPuzzle]:
+    return [generate_puzzle(n, seed, max_cage, node_limit) for seed in seeds]
+
+
+def generate_many(total: Optional[int], n: int, workers: Optional[int] = None,
+                  seed: int = 0, max_cage: int = 4, chunksize: int = 4,
+                  node_limit: int = 20_000) -> Iterator[GeneratedPuzzle]:
+    """
+    Stream 'total' puzzles (endlessly when None) generated across 'workers'
+    processes (default: all cores), in completion order. Puzzle k uses seed
+    'seed' + k, so a run is reproducible. workers <= 1 generates in-process.
+    """
+    seeds = count(seed) if total is None else iter(range(seed, seed + total))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for s in seeds:
+            yield generate_puzzle(n, s, max_cage, node_limit)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = set()
+    try:
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = list(islice(seeds, chunksize))
+                if not chunk:
+                    break
+                pending.add(pool.submit(_generate_chunk, n, chunk, max_cage, node_limit))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
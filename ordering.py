@@ -0,0 +1,75 @@
+"""
+Value orderings for ArithmeticPuzzleSolver's search.
+
+An ordering receives the solver, the cell about to be decided and its
+remaining values (ascending) and returns them in the order to try:
+
+    solver = ArithmeticPuzzleSolver(n, groups, value_order=cage_support)
+    solver = ArithmeticPuzzleSolver(n, groups, value_order=PhaseSaving(least_constraining),
+                                    var_order="dom/wdeg", restarts="luby")
+
+Orderings only look at the current domains and cage tables. A solver
+with shuffle_values shuffles the values before the ordering sees them, and the sorts
+below are stable, so ties are broken at random.
+"""
+from typing import Callable, Dict, Sequence, Tuple
+
+Cell = Tuple[int, int]
+ValueOrder = Callable[..., Sequence[int]]
+
+
+def ascending(solver, var: Cell, values: Sequence[int]) -> Sequence[int]:
+    """Smallest value first (the default)."""
+    return values
+
+
+def least_constraining(solver, var: Cell, values: Sequence[int]) -> Sequence[int]:
+    """
+    Least-constraining value: values the fewest other cells of var's row
+    and column can still take come first, since assigning them removes
+    the fewest values from the peers' domains.
+    """
+    domains = solver.domains
+    row, col = var
+    peers = [domains[(row, j)] for j in range(solver.n) if j != col]
+    peers += [domains[(i, col)] for i in range(solver.n) if i != row]
+    return sorted(values, key=lambda v: sum(mask >> v & 1 for mask in peers))
+
+
+def cage_support(solver, var: Cell, values: Sequence[int]) -> Sequence[int]:
+    """
+    Values that appear in the most cage tuples still possible under the
+    current domains come first (cells of bounds-reasoned cages keep their
+    order).
+    """
+    domains = solver.domains
+    support: Dict[int, int] = dict.fromkeys(values, 0)
+    for constraint in solver.constraints.watchers[var]:
+        if constraint.kind == 'cage':
+            table = constraint.table
+            counts = table.support_counts([domains[c] for c in table.cells], table.index[var])
+            for v in values:
+                support[v] += counts.get(v, 0)
+    return sorted(values, key=lambda v: -support[v])
+
+
+class PhaseSaving:
+    """
+    Phase saving: try first the value the cell held last time forward
+    checking accepted it (solver._phases, kept across backtracking and
+    restarts), then the rest in 'order'. After a restart the search heads
+    straight back towards the assignment the previous run had built.
+    """
+
+    def __init__(self, order: ValueOrder = ascending):
+        self.order = order
+
+    def __call__(self, solver, var: Cell, values: Sequence[int]) -> Sequence[int]:
+        values = self.order(solver, var, values)
+        phase = solver._phases.get(var)
+        if phase is not None and phase in values and values[0] != phase:
+            values = (phase,) + tuple(v for v in values if v != phase)
+        return values
+
+    def __repr__(self) -> str:
+        return f"PhaseSaving({self.order.__qualname__})"
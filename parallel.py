@@ -0,0 +1,348 @@
+"""
+Parallel solving for ArithmeticPuzzleSolver.
+
+solve_many fans a stream of puzzles out over a process pool in chunks and
+yields one PuzzleResult per puzzle as chunks complete:
+
+    from parallel import solve_many
+
+    for result in solve_many(puzzles, algorithm="ac3+backtracking", workers=8):
+        print(result.index, result.status, result.elapsed)
+
+Puzzles are (n, groups) pairs. Only a bounded number of chunks is in flight
+at a time, so 'puzzles' may be a lazy iterator over a very large corpus.
+
+solve_portfolio races several strategy/heuristic configurations on one
+puzzle in separate processes and keeps the first answer
+(ArithmeticPuzzleSolver.solve(algorithm="portfolio") uses it).
+
+solve_split spreads the search tree of one hard puzzle over a process pool:
+the shallow levels are expanded into subproblems, and a worker that spends
+its node budget hands its unexplored choice points back as new subproblems
+so idle workers can pick them up (ArithmeticPuzzleSolver.solve(
+algorithm="parallel")).
+"""
+import multiprocessing
+import os
+import queue
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from arithmetic_puzzle import ArithmeticPuzzleSolver
+from constraints import mask_values
+from search import SearchEngine, Subproblem
+
+Cell = Tuple[int, int]
+Puzzle = Tuple[int, List[Tuple[Set[Cell], str, int]]]
+
+
+class PuzzleResult(NamedTuple):
+    """
+    Outcome for one puzzle of a batch:
+    - status: "solved", "unsat", "timeout", "incomplete" (ac3 alone left
+      open cells) or "error"
+    - error: the exception text when status is "error"
+    - id: the puzzle's id, when it carries one (a corpus.CorpusPuzzle)
+    """
+    index: int
+    status: str
+    solution: Optional[Dict[Cell, int]]
+    elapsed: float
+    error: Optional[str] = None
+    id: Optional[str] = None
+
+
+def solve_puzzle(n: int, groups, algorithm: str = "ac3+backtracking",
+                 timeout: Optional[float] = None, **solver_options) -> Tuple[str, Optional[Dict[Cell, int]]]:
+    """
+    Solve one puzzle without console output, giving up after 'timeout'
+    seconds of search. Building the solver (cage tables) and AC-3 run
+    before the clock starts and are not bounded. 'solver_options' go to
+    ArithmeticPuzzleSolver (tie_break, all_different, ...). Returns
+    (status, solution).
+    """
+    if algorithm not in ("ac3", "ac3+backtracking", "backtracking", "backtracking_no_fc"):
+        raise ValueError(f"Unknown algorithm: {algorithm}")
+    result = ArithmeticPuzzleSolver(n, groups, **solver_options).solve_result(algorithm, timeout=timeout)
+    return result.status, result.solution
+
+
+def _puzzle_id(puzzle) -> Optional[str]:
+    # Only corpus puzzles have ids; other tuples (a GeneratedPuzzle) may
+    # carry something else third
+    return getattr(puzzle, "id", None)
+
+
+def _solve_chunk(chunk: List[Tuple[int, Puzzle]], algorithm: str,
+                 timeout: Optional[float]) -> List[PuzzleResult]:
+    # Runs in a worker process; one bad puzzle must not sink its chunk
+    results = []
+    for index, puzzle in chunk:
+        n, groups = puzzle[:2]
+        start = time.perf_counter()
+        try:
+            status, solution = solve_puzzle(n, groups, algorithm, timeout)
+            results.append(PuzzleResult(index, status, solution, time.perf_counter() - start,
+                                        id=_puzzle_id(puzzle)))
+        except Exception as exc:
+            results.append(PuzzleResult(index, "error", None, time.perf_counter() - start, repr(exc),
+                                        id=_puzzle_id(puzzle)))
+    return results
+
+
+def _chunks(puzzles: Iterable[Puzzle], size: int) -> Iterator[List[Tuple[int, Puzzle]]]:
+    numbered = enumerate(puzzles)
+    while True:
+        chunk = list(islice(numbered, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def solve_many(puzzles: Iterable[Puzzle], algorithm: str = "ac3+backtracking",
+               workers: Optional[int] = None, chunksize: int = 16,
+               timeout: Optional[float] = None) -> Iterator[PuzzleResult]:
+    """
+    Solve many puzzles across 'workers' processes (default: all cores),
+    yielding results in completion order; PuzzleResult.index is the
+    puzzle's position in 'puzzles'. 'timeout' bounds only the search of each
+    puzzle, as in solve_puzzle, while PuzzleResult.elapsed also counts
+    setup and AC-3. Failures are reported per puzzle: if a worker process
+    dies, its chunk is retried one puzzle at a time and only the puzzle that
+    kills a worker again is reported as an error. workers <= 1 solves
+    in-process.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = _chunks(puzzles, chunksize)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _solve_chunk(chunk, algorithm, timeout)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = {}   # future -> (chunk, is_retry)
+    retries = []   # single puzzles to rerun after a worker crash
+
+    def submit(chunk, is_retry: bool) -> None:
+        pending[pool.submit(_solve_chunk, chunk, algorithm, timeout)] = (chunk, is_retry)
+
+    def refill() -> None:
+        if retries:
+            # After a crash, rerun the suspects alone, one at a time, so only
+            # the puzzle that kills a worker again is blamed
+            if not pending:
+                submit([retries.pop()], True)
+            return
+        while len(pending) < 2 * workers:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            submit(chunk, False)
+
+    try:
+        refill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                chunk, is_retry = pending.pop(future)
+                try:
+                    yield from future.result()
+                except BrokenProcessPool as exc:
+                    broken = True
+                    if is_retry:
+                        index, puzzle = chunk[0]
+                        yield PuzzleResult(index, "error", None, 0.0, repr(exc), id=_puzzle_id(puzzle))
+                    else:
+                        retries.extend(chunk)
+            if broken:
+                # Every future of a broken pool fails; requeue them all on a fresh one
+                for chunk, is_retry in pending.values():
+                    retries.extend(chunk)
+                pending.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = ProcessPoolExecutor(max_workers=workers)
+            refill()
+    except BaseException:
+        # Closed early or failed: drop the queued work instead of waiting for it
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    # Let the workers exit before the caller (or the interpreter) moves on
+    pool.shutdown(wait=True)
+
+
+# Configurations raced by solve_portfolio: (algorithm, solver options)
+DEFAULT_PORTFOLIO: List[Tuple[str, dict]] = [
+    ("ac3+backtracking", {}),
+    ("ac3+backtracking", {"tie_break": "cage"}),
+    ("backtracking", {"tie_break": "degree"}),
+    ("backtracking", {"backjumping": True, "nogood_limit": 10_000}),
+    ("ac3+backtracking", {"var_order": "dom/wdeg", "seed": 1}),
+    ("backtracking_no_fc", {}),
+]
+
+
+def _portfolio_worker(slot: int, n: int, groups, algorithm: str, options: dict,
+                      timeout: Optional[float], results) -> None:
+    try:
+        status, solution = solve_puzzle(n, groups, algorithm, timeout, **options)
+        results.put((slot, status, solution, None))
+    except Exception as exc:
+        results.put((slot, "error", None, repr(exc)))
+
+
+def solve_portfolio(n: int, groups, configs: Optional[List[Tuple[str, dict]]] = None,
+                    timeout: Optional[float] = None
+                    ) -> Tuple[str, Optional[Dict[Cell, int]], Optional[Tuple[str, dict]]]:
+    """
+    Run every (algorithm, solver options) configuration in its own process
+    and return (status, solution, winning configuration) as soon as one of
+    them solves the puzzle or proves it unsatisfiable; the rest are
+    terminated. Status is "timeout" when all of them ran out of time and
+    "error" when none finished cleanly.
+    """
+    configs = DEFAULT_PORTFOLIO if configs is None else configs
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_portfolio_worker,
+                                args=(slot, n, groups, algorithm, options, timeout, results),
+                                daemon=True)
+        for slot, (algorithm, options) in enumerate(configs)
+    ]
+    for worker in workers:
+        worker.start()
+    outcome = ("error", None, None)
+    try:
+        finished = set()
+        while len(finished) < len(workers):
+            try:
+                slot, status, solution, _ = results.get(timeout=0.05)
+            except queue.Empty:
+                # a worker that died without reporting counts as finished
+                finished.update(i for i, w in enumerate(workers)
+                                if not w.is_alive() and w.exitcode != 0)
+                continue
+            finished.add(slot)
+            if status in ("solved", "unsat"):
+                return status, solution, configs[slot]
+            if status == "timeout":
+                outcome = ("timeout", None, None)
+        return outcome
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+        results.close()
+
+
+# Solver of the puzzle being split, built once per worker process
+_split_solver: Optional[ArithmeticPuzzleSolver] = None
+
+
+def _init_split_worker(n: int, groups, solver_options: dict) -> None:
+    global _split_solver
+    _split_solver = ArithmeticPuzzleSolver(n, groups, **solver_options)
+
+
+def _load(solver: ArithmeticPuzzleSolver, piece: Subproblem) -> Dict[Cell, int]:
+    # Point the solver at a subproblem's state; returns a fresh assignment
+    assignment, domains = piece
+    solver.domains = dict(domains)
+    solver._trail = []
+    solver._clear_reasons()
+    return dict(assignment)
+
+
+def _branch(solver: ArithmeticPuzzleSolver, piece: Subproblem) -> List[Subproblem]:
+    # One subproblem per value of the MRV cell that survives forward checking
+    assignment = _load(solver, piece)
+    solver._reset_buckets(assignment)
+    var = solver.mrv(assignment)
+    solver._mark_assigned(var)
+    children = []
+    for value in mask_values(solver.domains[var]):
+        if not solver._is_consistent(var, value, assignment):
+            continue
+        mark = len(solver._trail)
+        assignment[var] = value
+        if solver.forward_check(var, value, assignment):
+            children.append((dict(assignment), dict(solver.domains)))
+        solver._undo(mark)
+        del assignment[var]
+    return children
+
+
+def _search_piece(piece: Subproblem, node_limit: int, timeout: Optional[float]
+                  ) -> Tuple[str, Optional[Dict[Cell, int]], List[Subproblem]]:
+    # Runs in a worker process: (status, solution, unexplored subproblems)
+    engine = SearchEngine(_split_solver, assignment=_load(_split_solver, piece))
+    deadline = time.perf_counter() + timeout if timeout is not None else None
+    solution = engine.run(node_limit=node_limit, deadline=deadline)
+    if solution is not None:
+        return "solved", solution, []
+    if engine.status == "paused":
+        return "paused", None, engine.split()
+    return "exhausted", None, []
+
+
+def solve_split(n: int, groups, workers: Optional[int] = None, node_limit: int = 5000,
+                timeout: Optional[float] = None, **solver_options
+                ) -> Tuple[str, Optional[Dict[Cell, int]]]:
+    """
+    Find one solution of a single puzzle with 'workers' processes (default:
+    all cores). After AC-3 the top of the search tree is expanded breadth
+    first until there are a few subproblems per worker; each task then
+    searches for at most 'node_limit' nodes before returning what it has
+    not explored yet, which keeps every worker busy until the end.
+    Returns (status, solution) with status "solved", "unsat" or "timeout".
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    solver = ArithmeticPuzzleSolver(n, groups, **solver_options)
+    if not solver.ac3():
+        return "unsat", None
+    # As in solve_result, 'timeout' bounds the search, not AC-3
+    deadline = time.perf_counter() + timeout if timeout is not None else None
+    total = len(solver.variables)
+    work = deque([({}, dict(solver.domains))])
+    if workers <= 1:
+        engine = SearchEngine(solver)
+        solution = engine.run(deadline=deadline)
+        if solution is not None:
+            return "solved", solution
+        return ("timeout" if engine.status == "paused" else "unsat"), None
+
+    while work and len(work) < 4 * workers:
+        piece = work.popleft()
+        if len(piece[0]) == total:
+            return "solved", piece[0]
+        work.extend(_branch(solver, piece))
+    if not work:
+        return "unsat", None
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_split_worker,
+                               initargs=(n, groups, solver_options))
+    pending = set()
+    try:
+        while work or pending:
+            while work and len(pending) < 2 * workers:
+                remaining = deadline - time.perf_counter() if deadline is not None else None
+                pending.add(pool.submit(_search_piece, work.popleft(), node_limit, remaining))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                status, solution, pieces = future.result()
+                if status == "solved":
+                    return "solved", solution
+                work.extend(pieces)
+            if deadline is not None and time.perf_counter() > deadline:
+                return "timeout", None
+        return "unsat", None
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,95 @@
+"""
+Propagation worklists for ArithmeticPuzzleSolver.ac3.
+
+A queue holds pending items (binary arcs (xi, xj) and n-ary constraint
+objects such as rows, columns and cages) and ignores items that are already waiting, so a busy
+cell cannot flood the worklist with copies of the same arc. The solver
+builds its queue through a factory that receives the solver, which lets
+priority queues look at live domains or constraint costs:
+
+    solver = ArithmeticPuzzleSolver(n, groups, queue_factory=smallest_domain_first)
+"""
+from collections import deque
+from heapq import heappop, heappush
+from itertools import count
+from typing import Callable, Hashable, Iterable
+
+
+class PropagationQueue:
+    """FIFO worklist (deque) with an in-queue membership set."""
+
+    def __init__(self, items: Iterable[Hashable] = ()):
+        self._queue = deque()
+        self._pending = set()
+        self.extend(items)
+
+    def push(self, item: Hashable) -> None:
+        if item not in self._pending:
+            self._pending.add(item)
+            self._queue.append(item)
+
+    def extend(self, items: Iterable[Hashable]) -> None:
+        for item in items:
+            self.push(item)
+
+    def pop(self) -> Hashable:
+        item = self._queue.popleft()
+        self._pending.discard(item)
+        return item
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+
+class PriorityPropagationQueue(PropagationQueue):
+    """
+    Worklist that pops the item with the lowest priority first, ties in
+    insertion order. Priorities are computed when an item is pushed.
+    """
+
+    def __init__(self, priority: Callable[[Hashable], float], items: Iterable[Hashable] = ()):
+        self.priority = priority
+        self._heap = []
+        self._counter = count()
+        self._pending = set()
+        self.extend(items)
+
+    def push(self, item: Hashable) -> None:
+        if item not in self._pending:
+            self._pending.add(item)
+            heappush(self._heap, (self.priority(item), next(self._counter), item))
+
+    def pop(self) -> Hashable:
+        item = heappop(self._heap)[2]
+        self._pending.discard(item)
+        return item
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+def fifo_queue(solver) -> PropagationQueue:
+    """Plain AC-3 order (the default)."""
+    return PropagationQueue()
+
+
+def smallest_domain_first(solver) -> PriorityPropagationQueue:
+    """Revise the items whose cells have the fewest remaining values first."""
+    domains = solver.domains
+
+    def priority(item) -> int:
+        if isinstance(item, tuple):
+            return domains[item[0]].bit_count()
+        return min(domains[c].bit_count() for c in item.cells)
+    return PriorityPropagationQueue(priority)
+
+
+def cheapest_constraint_first(solver) -> PriorityPropagationQueue:
+    """Revise cheap not-equal arcs and lines before propagators that scan cage tables."""
+    arcs = solver.constraints.arcs
+
+    def priority(item) -> int:
+        if isinstance(item, tuple):
+            return sum(c.cost for c in arcs[item])
+        return item.cost
+    return PriorityPropagationQueue(priority)
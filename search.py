@@ -0,0 +1,411 @@
+"""
+Non-recursive depth-first search for ArithmeticPuzzleSolver.
+
+SearchEngine keeps its choice points on an explicit stack instead of the
+Python call stack, so large grids never hit the recursion limit, and a
+search can stop after a node or time budget and later resume exactly where
+it left off:
+
+    engine = SearchEngine(solver)
+    solution = engine.run(node_limit=10_000)
+    while engine.status == "paused":
+        solution = engine.run(node_limit=10_000)
+
+The engine (with its solver) can be pickled between runs to checkpoint a
+long search, and a paused engine can hand its unexplored work over as
+independent subproblems (split) for other processes to finish.
+
+With solver.backjumping, forward-checking search is conflict-directed
+(FC-CBJ): every choice point collects the decision levels behind the
+failures below it (the solver's pruning reasons, see
+ArithmeticPuzzleSolver._clear_reasons) and, once out of values, jumps back
+to the deepest of them instead of the level just above. With
+solver.nogood_limit, each such conflict is also remembered as a nogood and
+later assignments completing one are rejected without a search.
+
+RestartSearch runs the engine under growing node budgets (Luby or
+geometric), starting over from the root each time one runs out. Restarts
+pay off together with what changes between runs: a seeded solver
+reshuffles its tie-breaks, and var_order="dom/wdeg" keeps the constraint
+weights learned from earlier failures.
+"""
+import time
+from collections import OrderedDict
+from itertools import count
+from typing import Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+from constraints import mask_values
+from tracing import NODE
+
+Cell = Tuple[int, int]
+# A self-contained piece of search: (assignment, domain masks)
+Subproblem = Tuple[Dict[Cell, int], Dict[Cell, int]]
+Nogood = FrozenSet[Tuple[Cell, int]]
+
+# Longer conflicts are not learned: they rarely recur
+NOGOOD_MAX_SIZE = 12
+
+
+class ChoicePoint:
+    """One decision level: the cell, the values to try, and where we are."""
+    __slots__ = ("var", "values", "index", "mark", "assigned", "conflicts")
+
+    def __init__(self, var: Cell, values: Tuple[int, ...]):
+        self.var = var
+        self.values = values
+        self.index = 0          # next value to try
+        self.mark = 0           # trail length before the current value
+        self.assigned = False   # whether values[index - 1] is currently assigned
+        # Backjumping: levels (bitmask) blamed for the values ruled out so
+        # far; -1 once a solution was found below (every level is blamed)
+        self.conflicts = 0
+
+
+class NogoodStore:
+    """
+    Learned nogoods: sets of (cell, value) decisions that cannot all hold in
+    a solution. Holds at most 'limit' of them, dropping the least recently
+    useful first, indexed by decision for the check on each assignment.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._nogoods: "OrderedDict[Nogood, None]" = OrderedDict()
+        self._by_decision: Dict[Tuple[Cell, int], Set[Nogood]] = {}
+        self.learned = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._nogoods)
+
+    def add(self, nogood: Nogood) -> None:
+        if len(nogood) > NOGOOD_MAX_SIZE or nogood in self._nogoods:
+            return
+        self._nogoods[nogood] = None
+        for decision in nogood:
+            self._by_decision.setdefault(decision, set()).add(nogood)
+        self.learned += 1
+        if len(self._nogoods) > self.limit:
+            old, _ = self._nogoods.popitem(last=False)
+            for decision in old:
+                self._by_decision[decision].discard(old)
+
+    def violated(self, var: Cell, value: int, assignment: Dict[Cell, int]) -> Optional[Nogood]:
+        """A nogood that assigning var = value would complete, if any."""
+        for nogood in self._by_decision.get((var, value), ()):
+            if all(cell == var or assignment.get(cell) == v for cell, v in nogood):
+                self._nogoods.move_to_end(nogood)
+                self.hits += 1
+                return nogood
+        return None
+
+
+class SearchEngine:
+    """
+    Explicit-stack backtracking shared by every search strategy.
+
+    forward_checking=True prunes neighbours with solver.forward_check after
+    each assignment (solve(..., "backtracking") and after AC-3); False is
+    pure backtracking (solve(..., "backtracking_no_fc")). Backjumping and
+    nogood learning follow solver.backjumping / solver.nogood_limit and need
+    forward checking, whose domain wipeouts they explain.
+
+    status is "ready" before the first run, then "paused" (budget spent),
+    "solved" (a solution was just returned; run() again looks for the next
+    one) or "exhausted" (no more solutions).
+    """
+
+    def __init__(self, solver, forward_checking: bool = True,
+                 assignment: Optional[Dict[Cell, int]] = None):
+        self.solver = solver
+        self.forward_checking = forward_checking
+        self.assignment: Dict[Cell, int] = assignment if assignment is not None else {}
+        self.stack: List[ChoicePoint] = []
+        self.backjumping = forward_checking and solver.backjumping
+        self.nogoods: Optional[NogoodStore] = None
+        if self.backjumping and solver.nogood_limit > 0:
+            self.nogoods = NogoodStore(solver.nogood_limit)
+        # Decision level of each cell assigned by the search (for nogood hits)
+        self._levels: Dict[Cell, int] = {}
+        self.nodes = 0
+        self.backtracks = 0
+        self.backjumps = 0
+        self.max_depth = 0
+        self.status = "ready"
+
+    def _open(self, var: Cell) -> None:
+        # Take 'var' out of the MRV buckets and make it the next decision
+        solver = self.solver
+        solver._mark_assigned(var)
+        values = mask_values(solver.domains[var])
+        if solver.shuffle_values:
+            values = tuple(solver._rng.sample(values, len(values)))
+        frame = ChoicePoint(var, tuple(solver.value_order(solver, var, values)))
+        if self.backjumping:
+            # The values already pruned are charged to the levels that pruned them
+            frame.conflicts = solver._reasons[var]
+        self.stack.append(frame)
+
+    def _start(self) -> Optional[Dict[Cell, int]]:
+        solver = self.solver
+        solver._reset_buckets(self.assignment)
+        if len(self.assignment) == len(solver.variables):
+            self.status = "solved"
+            return dict(self.assignment)
+        var = solver.mrv(self.assignment)
+        if var is not None:
+            self._open(var)
+        self.status = "paused"
+        return None
+
+    def run(self, node_limit: Optional[int] = None,
+            deadline: Optional[float] = None) -> Optional[Dict[Cell, int]]:
+        """
+        Search until a solution is found, the tree is exhausted, 'node_limit'
+        more nodes have been tried, or time.perf_counter() passes 'deadline'.
+        Returns the solution, or None (check status for why).
+        """
+        stats = self.solver.stats
+        if stats is None:
+            return self._run(node_limit, deadline)
+        nodes, backtracks, backjumps = self.nodes, self.backtracks, self.backjumps
+        learned, hits = (self.nogoods.learned, self.nogoods.hits) if self.nogoods else (0, 0)
+        with stats.phase("search"):
+            solution = self._run(node_limit, deadline)
+        stats.nodes += self.nodes - nodes
+        stats.backtracks += self.backtracks - backtracks
+        stats.backjumps += self.backjumps - backjumps
+        if self.nogoods is not None:
+            stats.nogoods += self.nogoods.learned - learned
+            stats.nogood_hits += self.nogoods.hits - hits
+        stats.max_depth = max(stats.max_depth, self.max_depth)
+        return solution
+
+    def _run(self, node_limit: Optional[int], deadline: Optional[float]) -> Optional[Dict[Cell, int]]:
+        if self.status == "exhausted":
+            return None
+        if self.status == "ready":
+            solution = self._start()
+            if solution is not None:
+                return solution
+
+        solver = self.solver
+        assignment = self.assignment
+        stack = self.stack
+        total = len(solver.variables)
+        budget = node_limit if node_limit is not None else -1
+        # Per-node events only when the tracer asked for them
+        tracer = solver.tracer if solver.tracer.level >= NODE else None
+        backjumping = self.backjumping
+        nogoods = self.nogoods
+        levels = self._levels
+
+        while stack:
+            frame = stack[-1]
+            var = frame.var
+            if frame.assigned:
+                # Retract the value tried last before moving on
+                solver._undo(frame.mark)
+                del assignment[var]
+                frame.assigned = False
+
+            values = frame.values
+            descended = False
+            while frame.index < len(values):
+                value = values[frame.index]
+                frame.index += 1
+                if not solver._is_consistent(var, value, assignment):
+                    if backjumping:
+                        frame.conflicts |= solver._scope_reasons(self._scope(var))
+                    continue
+                if nogoods is not None:
+                    nogood = nogoods.violated(var, value, assignment)
+                    if nogood is not None:
+                        for cell, _ in nogood:
+                            if cell != var:
+                                frame.conflicts |= 1 << levels[cell]
+                        continue
+                assignment[var] = value
+                # Remember where this decision level starts on the trail
+                frame.mark = len(solver._trail)
+                frame.assigned = True
+                self.nodes += 1
+                budget -= 1
+                if tracer is not None:
+                    tracer.event("node", var=var, value=value, depth=len(stack) - 1)
+                if backjumping:
+                    levels[var] = len(stack) - 1
+                    solver._cause = 1 << (len(stack) - 1)
+                if self.forward_checking and not solver.forward_check(var, value, assignment):
+                    if backjumping:
+                        frame.conflicts |= solver._conflict
+                    solver._undo(frame.mark)
+                    del assignment[var]
+                    frame.assigned = False
+                    if budget == 0 or (deadline is not None and time.perf_counter() > deadline):
+                        self.status = "paused"
+                        return None
+                    continue
+                solver._phases[var] = value
+                if len(assignment) == total:
+                    if backjumping:
+                        # Levels above a solution must all be revisited
+                        for above in stack:
+                            above.conflicts = -1
+                    self.status = "solved"
+                    return dict(assignment)
+                self._open(solver.mrv(assignment))
+                if len(stack) > self.max_depth:
+                    self.max_depth = len(stack)
+                descended = True
+                break
+
+            if not descended:
+                # Every value of this cell failed: backtrack one level
+                solver._mark_unassigned(var)
+                stack.pop()
+                self.backtracks += 1
+                if tracer is not None:
+                    tracer.event("backtrack", var=var, depth=len(stack))
+                if backjumping:
+                    target = self._backjump(frame.conflicts & ~(1 << len(stack)))
+                    if tracer is not None and target < len(stack) - 1:
+                        tracer.event("backjump", var=var, depth=target)
+            if budget == 0 or (deadline is not None and time.perf_counter() > deadline):
+                self.status = "paused"
+                return None
+
+        self.status = "exhausted"
+        return None
+
+    def _scope(self, var: Cell) -> List[Cell]:
+        # Every cell sharing a constraint with 'var'
+        constraints = self.solver.constraints
+        cells = list(constraints.neighbors[var])
+        for constraint in constraints.watchers[var]:
+            cells.extend(constraint.cells)
+        return cells
+
+    def _backjump(self, conflicts: int) -> int:
+        """
+        After a choice point ran out of values because of the levels in
+        'conflicts', unwind to the deepest of them (everything when there
+        are none: the subtree has no solution at all) and charge it the
+        rest of the conflict. Learns the conflict as a nogood when enabled.
+        Returns the level the search resumes at.
+        """
+        solver = self.solver
+        stack = self.stack
+        assignment = self.assignment
+        if conflicts < 0:
+            target = len(stack) - 1  # a solution was found below: go back one level
+        else:
+            target = conflicts.bit_length() - 1
+            if self.nogoods is not None and conflicts:
+                self.nogoods.add(frozenset((stack[k].var, assignment[stack[k].var])
+                                           for k in range(target + 1) if conflicts >> k & 1))
+        while len(stack) - 1 > target:
+            frame = stack.pop()
+            solver._undo(frame.mark)
+            del assignment[frame.var]
+            solver._mark_unassigned(frame.var)
+            self.backjumps += 1
+        if stack:
+            stack[-1].conflicts |= conflicts
+        return target
+
+    def split(self) -> List[Subproblem]:
+        """
+        Give away the unexplored part of a paused search: one subproblem per
+        choice point, holding the assignment and domains of that level with
+        the cell's domain narrowed to the values not tried yet. Together the
+        subproblems cover exactly the solutions this engine had left; the
+        engine itself is exhausted afterwards.
+        """
+        solver = self.solver
+        assignment = self.assignment
+        pieces = []
+        for frame in reversed(self.stack):
+            if frame.assigned:
+                solver._undo(frame.mark)
+                del assignment[frame.var]
+                frame.assigned = False
+            rest = 0
+            for value in frame.values[frame.index:]:
+                rest |= 1 << value
+            if rest:
+                domains = dict(solver.domains)
+                domains[frame.var] = rest
+                pieces.append((dict(assignment), domains))
+            solver._mark_unassigned(frame.var)
+        self.stack.clear()
+        self.status = "exhausted"
+        # Shallowest (largest) pieces first
+        pieces.reverse()
+        return pieces
+
+
+def luby(i: int) -> int:
+    """The i-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ..."""
+    while True:
+        k = i.bit_length()
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+
+
+def restart_budgets(policy: str, base: int) -> Iterator[int]:
+    """Node budgets of successive runs: base * luby(i), or base * 1.5**i for "geometric"."""
+    for i in count(1):
+        if policy == "luby":
+            yield base * luby(i)
+        elif policy == "geometric":
+            yield int(base * 1.5 ** (i - 1))
+        else:
+            raise ValueError(f"Unknown restarts policy: {policy}")
+
+
+class RestartSearch:
+    """
+    Search that gives up on a run once its node budget (solver.restarts,
+    solver.restart_base) is spent and starts a fresh SearchEngine from the
+    same root. Budgets grow without bound, so the search stays complete.
+    Learned nogoods stay valid from one run to the next and are handed on.
+    Offers SearchEngine's run(deadline=...) and status ("solved",
+    "exhausted", or "paused" when the deadline passed).
+    """
+
+    def __init__(self, solver, forward_checking: bool = True):
+        self.solver = solver
+        self.forward_checking = forward_checking
+        self.nodes = 0
+        self.restarts = 0
+        self.status = "ready"
+
+    def run(self, deadline: Optional[float] = None) -> Optional[Dict[Cell, int]]:
+        solver = self.solver
+        mark = len(solver._trail)
+        nogoods = None
+        for budget in restart_budgets(solver.restarts, solver.restart_base):
+            engine = SearchEngine(solver, self.forward_checking)
+            if nogoods is not None:
+                engine.nogoods = nogoods
+            solution = engine.run(node_limit=budget, deadline=deadline)
+            self.nodes += engine.nodes
+            if engine.status != "paused":
+                self.status = engine.status
+                return solution
+            # Budget spent: unwind this run and start over
+            solver._undo(mark)
+            nogoods = engine.nogoods
+            if deadline is not None and time.perf_counter() > deadline:
+                self.status = "paused"
+                return None
+            self.restarts += 1
+            if solver.stats is not None:
+                solver.stats.restarts += 1
+            if solver.tracer.level:
+                solver.tracer.event("restart", restarts=self.restarts, nodes=self.nodes)
+            if solver._rng is not None:
+                solver._shuffle_ranks()
+        return None  # unreachable: the budgets never run out
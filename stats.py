@@ -0,0 +1,91 @@
+"""
+Search and propagation statistics for ArithmeticPuzzleSolver.
+
+A solver fills solver.stats as it runs (pass stats=False to the
+constructor to skip all bookkeeping):
+
+    solver = ArithmeticPuzzleSolver(n, groups)
+    solver.solve("ac3+backtracking")
+    print(solver.stats)
+
+Counters accumulate over the solver's lifetime; call stats.reset() between
+runs that should be measured separately.
+"""
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class SolverStats:
+    """
+    - nodes / backtracks: values tried by the search / levels abandoned
+    - backjumps: further levels skipped by conflict-directed backjumping
+    - restarts: runs abandoned by RestartSearch once their budget was spent
+    - nogoods / nogood_hits: nogoods learned / assignments they rejected
+    - max_depth: deepest decision level reached
+    - revise_calls: AC-3 _revise calls on binary arcs
+    - consistency_checks: _is_consistent calls
+    - checks: constraint kind -> revise/forward/propagate calls on that kind
+    - queue_high_water: longest AC-3 worklist seen
+    - time_ns: phase ("ac3", "search") -> nanoseconds spent
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.nodes = 0
+        self.backtracks = 0
+        self.backjumps = 0
+        self.restarts = 0
+        self.nogoods = 0
+        self.nogood_hits = 0
+        self.max_depth = 0
+        self.revise_calls = 0
+        self.consistency_checks = 0
+        self.checks: Counter = Counter()
+        self.queue_high_water = 0
+        self.time_ns: Dict[str, int] = defaultdict(int)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Add the time spent inside the block to time_ns[name]."""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.time_ns[name] += time.perf_counter_ns() - start
+
+    def as_dict(self) -> dict:
+        """Plain-dict snapshot (JSON serializable)."""
+        return {
+            "nodes": self.nodes,
+            "backtracks": self.backtracks,
+            "backjumps": self.backjumps,
+            "restarts": self.restarts,
+            "nogoods": self.nogoods,
+            "nogood_hits": self.nogood_hits,
+            "max_depth": self.max_depth,
+            "revise_calls": self.revise_calls,
+            "consistency_checks": self.consistency_checks,
+            "checks": dict(self.checks),
+            "queue_high_water": self.queue_high_water,
+            "time_ns": dict(self.time_ns),
+        }
+
+    def __str__(self) -> str:
+        lines = [
+            f"nodes: {self.nodes}  backtracks: {self.backtracks}  max depth: {self.max_depth}",
+            f"revise calls: {self.revise_calls}  consistency checks: {self.consistency_checks}"
+            f"  queue high-water: {self.queue_high_water}",
+        ]
+        if self.backjumps or self.nogoods or self.restarts:
+            lines.append(f"backjumps: {self.backjumps}  nogoods: {self.nogoods}"
+                         f"  nogood hits: {self.nogood_hits}  restarts: {self.restarts}")
+        if self.checks:
+            lines.append("checks: " + ", ".join(f"{kind}={count}" for kind, count in sorted(self.checks.items())))
+        if self.time_ns:
+            lines.append("time: " + ", ".join(f"{phase}={ns / 1e6:.3f}ms"
+                                             for phase, ns in self.time_ns.items()))
+        return "\n".join(lines)
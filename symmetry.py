@@ -0,0 +1,254 @@
+"""
+Symmetry-aware solution cache.
+
+Permuting rows, permuting columns or transposing the grid maps a puzzle to
+an equivalent one, and so does relabeling the digits when every group is a
+given cell (cage arithmetic is not invariant under relabeling). canonicalize
+picks one representative of a puzzle's class plus the Transform leading to
+it, so SolutionCache can answer any member of the class from one cached
+solution:
+
+    cache = SolutionCache(max_entries=10_000, directory=".solution-cache")
+    solution = cache.solve(n, groups)
+
+Lookups first try the puzzle exactly as given (a hash lookup), then its
+canonical form; only a miss on both runs the solver. Canonicalization uses
+color refinement of rows, columns and cages; rows or columns it cannot tell
+apart are tried in every order. When that would take more than TIE_LIMIT
+layouts in all, the puzzle has no canonical form here: it is solved and
+cached under its exact form only, so symmetric puzzles cost cache hits,
+never more than a plain solve.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from itertools import permutations, product
+from math import factorial
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from arithmetic_puzzle import ArithmeticPuzzleSolver
+
+Cell = Tuple[int, int]
+Group = Tuple[Set[Cell], str, int]
+
+# Most layouts (row order x column order, both orientations together)
+# canonicalize tries before giving up on a canonical form
+TIE_LIMIT = 48
+
+_MISS = object()
+
+
+class Transform(NamedTuple):
+    """
+    Maps a puzzle onto its canonical form: cell (r, c) is first transposed
+    when 'transpose' is set, then lands on (row_pos[r], col_pos[c]); digit
+    v becomes digits[v - 1].
+    """
+    transpose: bool
+    row_pos: Tuple[int, ...]
+    col_pos: Tuple[int, ...]
+    digits: Tuple[int, ...]
+
+    def cell(self, cell: Cell) -> Cell:
+        r, c = (cell[1], cell[0]) if self.transpose else cell
+        return self.row_pos[r], self.col_pos[c]
+
+    def to_original(self, solution: Dict[Cell, int]) -> Dict[Cell, int]:
+        """Carry a solution of the canonical puzzle back to the original one."""
+        n = len(self.row_pos)
+        original = {d: v + 1 for v, d in enumerate(self.digits)}
+        return {(r, c): original[solution[self.cell((r, c))]] for r in range(n) for c in range(n)}
+
+
+def _rank(colors: Dict) -> Dict:
+    # Replace colors by their rank among the distinct colors (order-independent)
+    order = {color: k for k, color in enumerate(sorted(set(colors.values())))}
+    return {key: order[color] for key, color in colors.items()}
+
+
+def _refine(n: int, groups: List[Group], relabel: bool) -> Tuple[Dict[int, int], Dict[int, int]]:
+    # Color refinement over rows, columns and cages; returns row and column colors
+    label = {(r, c): ("none",) for r in range(n) for c in range(n)}
+    cage_of = {}
+    for g, (cells, op, target) in enumerate(groups):
+        for cell in cells:
+            label[cell] = (op, None if relabel else target, len(cells))
+            cage_of[cell] = g
+    cell_color = _rank(label)
+    while True:
+        rows = _rank({r: tuple(sorted(cell_color[(r, c)] for c in range(n))) for r in range(n)})
+        cols = _rank({c: tuple(sorted(cell_color[(r, c)] for r in range(n))) for c in range(n)})
+        cage_color = {g: tuple(sorted(cell_color[cell] for cell in cells))
+                      for g, (cells, _, _) in enumerate(groups)}
+        refined = _rank({cell: (cell_color[cell], rows[cell[0]], cols[cell[1]],
+                                cage_color.get(cage_of.get(cell), ()))
+                         for cell in cell_color})
+        # Refinement only splits color classes; stop once none split
+        if len(set(refined.values())) == len(set(cell_color.values())):
+            return rows, cols
+        cell_color = refined
+
+
+def _blocks(colors: Dict[int, int]) -> List[List[int]]:
+    # The indices grouped into tie classes, classes in color order
+    classes: Dict[int, List[int]] = {}
+    for index in sorted(colors):
+        classes.setdefault(colors[index], []).append(index)
+    return [classes[color] for color in sorted(classes)]
+
+
+def _order_count(colors: Dict[int, int]) -> int:
+    count = 1
+    for block in _blocks(colors):
+        count *= factorial(len(block))
+    return count
+
+
+def _orders(colors: Dict[int, int]) -> List[List[int]]:
+    # Every ordering of the indices sorted by color, tie classes permuted
+    return [[i for perm in combo for i in perm]
+            for combo in product(*(permutations(block) for block in _blocks(colors)))]
+
+
+def _encode(n: int, groups: List[Group], rows: List[int], cols: List[int],
+            relabel: bool) -> Tuple[tuple, Tuple[int, ...]]:
+    # The puzzle laid out in the given row/column order, plus its digit map
+    row_pos = {r: k for k, r in enumerate(rows)}
+    col_pos = {c: k for k, c in enumerate(cols)}
+    placed = sorted((tuple(sorted((row_pos[r], col_pos[c]) for r, c in cells)), op, target)
+                    for cells, op, target in groups)
+    digits = tuple(range(1, n + 1))
+    if relabel:
+        # Number the digits by first appearance in canonical cell order
+        mapping = {}
+        for _, _, target in placed:
+            mapping.setdefault(target, len(mapping) + 1)
+        for v in range(1, n + 1):
+            mapping.setdefault(v, len(mapping) + 1)
+        digits = tuple(mapping[v] for v in range(1, n + 1))
+        placed = sorted((cells, op, mapping[target]) for cells, op, target in placed)
+    return tuple(placed), digits
+
+
+def canonicalize(n: int, groups: List[Group]) -> Optional[Tuple[str, List[Group], Transform]]:
+    """
+    The canonical form of a puzzle: (key, canonical groups, transform from
+    the given puzzle to the canonical one), or None when refinement leaves
+    so many tied rows and columns that more than TIE_LIMIT layouts would
+    have to be compared. Puzzles related by row/column permutations,
+    transposition and (for givens-only puzzles) digit relabeling share a key.
+    """
+    relabel = all(op == '' for _, op, _ in groups)
+    orientations = []
+    layouts = 0
+    for transpose in (False, True):
+        oriented = [({(c, r) for r, c in cells} if transpose else set(cells), op, target)
+                    for cells, op, target in groups]
+        row_colors, col_colors = _refine(n, oriented, relabel)
+        layouts += _order_count(row_colors) * _order_count(col_colors)
+        if layouts > TIE_LIMIT:
+            return None
+        orientations.append((transpose, oriented, row_colors, col_colors))
+    best = None
+    for transpose, oriented, row_colors, col_colors in orientations:
+        for rows in _orders(row_colors):
+            for cols in _orders(col_colors):
+                encoding, digits = _encode(n, oriented, rows, cols, relabel)
+                if best is None or encoding < best[0]:
+                    best = (encoding, transpose, rows, cols, digits)
+    encoding, transpose, rows, cols, digits = best
+    row_pos = [0] * n
+    col_pos = [0] * n
+    for k, r in enumerate(rows):
+        row_pos[r] = k
+    for k, c in enumerate(cols):
+        col_pos[c] = k
+    transform = Transform(transpose, tuple(row_pos), tuple(col_pos), digits)
+    key = hashlib.sha256(json.dumps([n, encoding]).encode()).hexdigest()
+    canonical = [(set(cells), op, target) for cells, op, target in encoding]
+    return key, canonical, transform
+
+
+def _exact_key(n: int, groups: List[Group]):
+    return n, frozenset((frozenset(cells), op, target) for cells, op, target in groups)
+
+
+class SolutionCache:
+    """
+    LRU cache of solutions in front of ArithmeticPuzzleSolver. Holds up to
+    'max_entries' puzzles in memory; with a 'directory', canonical solutions
+    are also kept on disk (an ArtifactCache bounded by max_bytes) and shared
+    across processes and runs. Unsatisfiable puzzles are cached too.
+    """
+
+    def __init__(self, max_entries: int = 10_000, directory: Optional[str] = None,
+                 max_bytes: int = 64 * 2**20):
+        self.max_entries = max_entries
+        self._exact: OrderedDict = OrderedDict()      # exact puzzle -> solution
+        self._canonical: OrderedDict = OrderedDict()  # canonical key -> row-major values
+        self.disk = None
+        if directory is not None:
+            from artifacts import ArtifactCache
+            self.disk = ArtifactCache(directory, max_bytes, suffix=".json")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _remember(table: OrderedDict, key, value, limit: int) -> None:
+        table[key] = value
+        table.move_to_end(key)
+        if len(table) > limit:
+            table.popitem(last=False)
+
+    def _lookup(self, key: str):
+        values = self._canonical.get(key, _MISS)
+        if values is not _MISS:
+            self._canonical.move_to_end(key)
+            return values
+        if self.disk is not None:
+            data = self.disk.get(key)
+            if data is not None:
+                values = json.loads(data)["solution"]
+                self._remember(self._canonical, key, values, self.max_entries)
+                return values
+        return _MISS
+
+    def solve(self, n: int, groups: List[Group], algorithm: str = "ac3+backtracking",
+              **solver_options) -> Optional[Dict[Cell, int]]:
+        """The puzzle's solution (None when it has none), from the cache when possible."""
+        exact = _exact_key(n, groups)
+        if exact in self._exact:
+            self.hits += 1
+            self._exact.move_to_end(exact)
+            solution = self._exact[exact]
+            return dict(solution) if solution is not None else None
+
+        canonical_form = canonicalize(n, groups)
+        if canonical_form is None:
+            # Too symmetric to canonicalize cheaply: cache the exact puzzle only
+            self.misses += 1
+            result = ArithmeticPuzzleSolver(n, groups, **solver_options).solve_result(algorithm)
+            if result.status not in ("solved", "unsat"):
+                return None
+            self._remember(self._exact, exact, result.solution, self.max_entries)
+            return dict(result.solution) if result.solution is not None else None
+
+        key, canonical, transform = canonical_form
+        values = self._lookup(key)
+        if values is _MISS:
+            self.misses += 1
+            result = ArithmeticPuzzleSolver(n, canonical, **solver_options).solve_result(algorithm)
+            if result.status not in ("solved", "unsat"):
+                return None  # a timeout or a partial "ac3" run proves nothing
+            found = result.solution
+            values = [found[(i, j)] for i in range(n) for j in range(n)] if found else None
+            self._remember(self._canonical, key, values, self.max_entries)
+            if self.disk is not None:
+                self.disk.put(key, json.dumps({"solution": values}).encode())
+        else:
+            self.hits += 1
+        solution = None
+        if values is not None:
+            solution = transform.to_original({divmod(k, n): v for k, v in enumerate(values)})
+        self._remember(self._exact, exact, solution, self.max_entries)
+        return dict(solution) if solution is not None else None
@@ -0,0 +1,202 @@
+"""
+NumPy tensor backend for ArithmeticPuzzleSolver.
+
+All domains live in one n×n×n boolean array: D[i, j, v - 1] is True while
+value v is still possible for cell (i, j). Row/column elimination, hidden
+singles and the MRV counts are whole-grid reductions over that array. Table
+cages of the same size are stacked into one tuple array, so checking every
+such cage against the domains is a single indexing operation. Select it
+with solve(..., backend="numpy").
+"""
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from cages import CageTable
+
+Cell = Tuple[int, int]
+
+
+class _TensorCage:
+    """
+    A cage's cell coordinates plus either its tuple array (one row per
+    allowed tuple, 0-based values) or, for add/mult cages whose product space
+    exceeds table_limit, the target for bounds reasoning.
+    """
+
+    def __init__(self, cells: Set[Cell], op: str, target: int, n: int, table_limit: int):
+        self.cells = tuple(sorted(cells))
+        self.rows = np.array([c[0] for c in self.cells])
+        self.cols = np.array([c[1] for c in self.cells])
+        self.op = op
+        self.target = target
+        self.tuples = None
+        self.unconstrained = False
+        if op in ['add', '+', 'mult', '*'] and n ** len(self.cells) > table_limit:
+            return
+        tuples = CageTable(cells, op, target, n).tuples
+        if tuples is None:
+            self.unconstrained = True
+        else:
+            self.tuples = np.array(tuples, dtype=np.intp).reshape(len(tuples), len(self.cells)) - 1
+
+
+class _CageBatch:
+    """
+    All table cages with the same number of cells, stacked: rows/cols are
+    (cages, size) coordinates and tuples (rows, size) holds every cage's
+    tuples, with owner giving the cage each tuple belongs to.
+    """
+
+    def __init__(self, cages: List[_TensorCage]):
+        self.rows = np.array([c.rows for c in cages])
+        self.cols = np.array([c.cols for c in cages])
+        self.tuples = np.concatenate([c.tuples for c in cages])
+        self.owner = np.repeat(np.arange(len(cages)), [len(c.tuples) for c in cages])
+        self.size = self.rows.shape[1]
+        # coordinates of every tuple entry, for one gather over the tensor
+        self.tuple_rows = self.rows[self.owner]
+        self.tuple_cols = self.cols[self.owner]
+
+    def propagate(self, D: np.ndarray) -> None:
+        # Keep the values that appear in a tuple lying inside the domains
+        alive = D[self.tuple_rows, self.tuple_cols, self.tuples].all(axis=1)
+        supported = np.zeros(self.rows.shape + (D.shape[2],), dtype=bool)
+        live = self.tuples[alive]
+        supported[self.owner[alive][:, None], np.arange(self.size), live] = True
+        # Cages of a batch may share cells: fancy-index assignment would keep
+        # only the last cage's write to a shared cell, so AND them in place
+        np.logical_and.at(D, (self.rows, self.cols), supported)
+
+
+class TensorSolver:
+    """Propagation and depth-first search over a boolean domain tensor."""
+
+    def __init__(self, n: int, groups: List[Tuple[Set[Cell], str, int]],
+                 table_limit: int = 100_000):
+        self.n = n
+        self.domains = np.ones((n, n, n), dtype=bool)
+        self.cages = [_TensorCage(cells, op, target, n, table_limit)
+                      for cells, op, target in groups]
+        by_size: Dict[int, List[_TensorCage]] = {}
+        for cage in self.cages:
+            if cage.tuples is not None:
+                by_size.setdefault(len(cage.cells), []).append(cage)
+        self.batches = [_CageBatch(group) for group in by_size.values()]
+        # Only add/mult cages past table_limit are left for bounds reasoning
+        self.cages = [c for c in self.cages if c.tuples is None and not c.unconstrained]
+        self.values = np.arange(1, n + 1)
+        self.nodes = 0
+        # "ready", then "solved", "exhausted" or "paused" (deadline passed)
+        self.status = "ready"
+
+    def masks(self) -> Dict[Cell, int]:
+        """The domains as the bitmask dict used by ArithmeticPuzzleSolver."""
+        weights = 1 << self.values
+        packed = (self.domains * weights).sum(axis=2)
+        return {(i, j): int(packed[i, j]) for i in range(self.n) for j in range(self.n)}
+
+    def _cage(self, D: np.ndarray, cage: _TensorCage) -> None:
+        # Bounds reasoning for a large add/mult cage, in place
+        rows, cols = cage.rows, cage.cols
+        cells = D[rows, cols]
+        values = np.broadcast_to(self.values, cells.shape)
+        present = cells.any(axis=1)
+        if not present.all():
+            return
+        lo = np.where(cells, values, self.n + 1).min(axis=1)
+        hi = np.where(cells, values, 0).max(axis=1)
+        if cage.op in ['add', '+']:
+            # v + (sum of the others' extremes) must be able to reach the target
+            low = cage.target - (hi.sum() - hi)
+            high = cage.target - (lo.sum() - lo)
+        else:
+            low = np.ceil(cage.target / (np.prod(hi.astype(float)) / hi)).astype(int)
+            high = cage.target // (np.prod(lo.astype(float)) / lo).astype(int)
+            cells &= (cage.target % self.values == 0)
+        cells &= (values >= low[:, None]) & (values <= high[:, None])
+        D[rows, cols] = cells
+
+    def propagate(self, D: Optional[np.ndarray] = None) -> bool:
+        """
+        Run row/column elimination, hidden singles and the cages on D
+        (default: self.domains) in place until nothing changes. Returns
+        False on a wipeout.
+        """
+        D = self.domains if D is None else D
+        size = int(D.sum())
+        while True:
+            counts = D.sum(axis=2)
+            # A fixed cell removes its value from the rest of its row and column
+            fixed = D & (counts == 1)[:, :, None]
+            taken = fixed.any(axis=1)[:, None, :] | fixed.any(axis=0)[None, :, :]
+            D &= ~taken | fixed
+            # A value with one place left in a row or column must go there
+            in_row, in_col = D.sum(axis=1), D.sum(axis=0)
+            if not (in_row.all() and in_col.all()):
+                return False
+            hidden = (D & (in_row == 1)[:, None, :]) | (D & (in_col == 1)[None, :, :])
+            counts = hidden.sum(axis=2)
+            if (counts > 1).any():
+                return False
+            D[counts == 1] = hidden[counts == 1]
+            for batch in self.batches:
+                batch.propagate(D)
+            for cage in self.cages:
+                self._cage(D, cage)
+            if not D.any(axis=2).all():
+                return False
+            new_size = int(D.sum())
+            if new_size == size:
+                return True
+            size = new_size
+
+    def _select(self, D: np.ndarray) -> Optional[Cell]:
+        # MRV among undecided cells, ties broken row-major
+        counts = D.sum(axis=2)
+        counts[counts == 1] = self.n + 1
+        index = int(counts.argmin())
+        if counts.flat[index] > self.n:
+            return None
+        return divmod(index, self.n)
+
+    def _solution(self, D: np.ndarray) -> Dict[Cell, int]:
+        values = D.argmax(axis=2) + 1
+        return {(i, j): int(values[i, j]) for i in range(self.n) for j in range(self.n)}
+
+    def search(self, deadline: Optional[float] = None) -> Optional[Dict[Cell, int]]:
+        """
+        Depth-first search from the current (propagated) domains. Each level
+        keeps its own copy of the tensor, so backtracking just drops it.
+        Gives up with status "paused" once time.perf_counter() passes
+        'deadline'.
+        """
+        var = self._select(self.domains)
+        if var is None:
+            self.status = "solved"
+            return self._solution(self.domains)
+        frames = [[self.domains, var, np.flatnonzero(self.domains[var]), 0]]
+        while frames:
+            if deadline is not None and time.perf_counter() > deadline:
+                self.status = "paused"
+                return None
+            frame = frames[-1]
+            D, var, values, index = frame
+            if index == len(values):
+                frames.pop()
+                continue
+            frame[3] += 1
+            child = D.copy()
+            child[var] = False
+            child[var + (values[index],)] = True
+            self.nodes += 1
+            if not self.propagate(child):
+                continue
+            nxt = self._select(child)
+            if nxt is None:
+                self.status = "solved"
+                return self._solution(child)
+            frames.append([child, nxt, np.flatnonzero(child[nxt]), 0])
+        self.status = "exhausted"
+        return None
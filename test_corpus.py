@@ -0,0 +1,75 @@
+"""
+Corpus round trips: puzzles and their ids must survive JSONL -> binary ->
+JSONL through every reader (memory-mapped, plain file, stream).
+
+    python -m pytest test_corpus.py
+"""
+import io
+import os
+import struct
+import tempfile
+import unittest
+
+import example
+from corpus import MAGIC_V1, CorpusPuzzle, iter_puzzles, main, write_puzzles
+from generator import generate_puzzle
+
+PUZZLES = [
+    CorpusPuzzle(example.n1, example.groups1, "p-one"),
+    CorpusPuzzle(example.n2, example.groups2),
+    CorpusPuzzle(example.n3, example.groups3, "ünïcode / 3"),
+    CorpusPuzzle(example.n4, example.groups4, ""),
+]
+
+
+def _canonical(puzzle):
+    n, groups, id = puzzle
+    return n, [(sorted(cells), op, target) for cells, op, target in groups], id
+
+
+class RoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.dir.name, name)
+
+    def test_ids_survive_conversion(self):
+        write_puzzles(PUZZLES, self.path("a.jsonl"))
+        self.assertEqual(main(["convert", self.path("a.jsonl"), self.path("a.bin")]), 0)
+        self.assertEqual(main(["convert", self.path("a.bin"), self.path("b.jsonl"), "--jsonl"]), 0)
+        expected = [_canonical(p) for p in PUZZLES]
+        for name in ("a.bin", "b.jsonl"):
+            for use_mmap in (True, False):
+                with self.subTest(source=name, use_mmap=use_mmap):
+                    found = [_canonical(p) for p in iter_puzzles(self.path(name), use_mmap=use_mmap)]
+                    self.assertEqual(found, expected)
+        with open(self.path("a.bin"), "rb") as f:
+            stream = io.BytesIO(f.read())
+        self.assertEqual([p.id for p in iter_puzzles(stream)], [p.id for p in PUZZLES])
+
+    def test_generated_puzzles_have_no_id(self):
+        # A GeneratedPuzzle holds its solution third, which is not an id
+        puzzles = [generate_puzzle(4, seed) for seed in range(3)]
+        for binary in (False, True):
+            with self.subTest(binary=binary):
+                write_puzzles(puzzles, self.path("g"), binary=binary)
+                found = list(iter_puzzles(self.path("g")))
+                self.assertEqual([p.id for p in found], [None] * 3)
+                self.assertEqual([_canonical(p)[:2] for p in found],
+                                 [_canonical((p.n, p.groups, None))[:2] for p in puzzles])
+
+    def test_reads_binary_without_ids(self):
+        # A record of the first binary format: no id fields
+        body = struct.pack("<BIB", 1, 3, 2) + struct.pack("<2H", 0, 1)
+        data = MAGIC_V1 + struct.pack("<IBH", len(body) + 3, 2, 1) + body
+        with open(self.path("old.bin"), "wb") as f:
+            f.write(data)
+        for source in (self.path("old.bin"), io.BytesIO(data)):
+            (puzzle,) = iter_puzzles(source)
+            self.assertEqual(puzzle, CorpusPuzzle(2, [({(0, 0), (0, 1)}, 'add', 3)], None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Regression tests for the search: on small random puzzles, every solver
+configuration must find exactly the solutions a brute-force enumeration
+finds. Covers backjumping, nogood learning, bounds-propagated cages, both
+all-different encodings, variable and value orderings.
+
+    python -m pytest test_search.py    (or python -m unittest test_search)
+"""
+import random
+import unittest
+from typing import Dict, Iterator, List, Set, Tuple
+
+from arithmetic_puzzle import ArithmeticPuzzleSolver
+from generator import cage_operation, latin_square, partition_cages
+from ordering import PhaseSaving, cage_support, least_constraining
+from propagation import smallest_domain_first
+
+Cell = Tuple[int, int]
+Group = Tuple[Set[Cell], str, int]
+
+MODES = {
+    "default": {},
+    "pairwise": {"all_different": "pairwise"},
+    "backjumping": {"backjumping": True},
+    "backjumping+nogoods": {"backjumping": True, "nogood_limit": 20},
+    "pairwise+backjumping": {"all_different": "pairwise", "backjumping": True, "nogood_limit": 20},
+    # every add/mult cage falls back to bounds reasoning
+    "bounds": {"table_limit": 1},
+    "bounds+backjumping": {"table_limit": 1, "backjumping": True, "nogood_limit": 20},
+    "dom/wdeg": {"var_order": "dom/wdeg", "seed": 3, "shuffle_values": True},
+    "least_constraining": {"value_order": least_constraining, "tie_break": "degree"},
+    "cage_support": {"value_order": cage_support, "queue_factory": smallest_domain_first},
+    "phase_saving": {"value_order": PhaseSaving(), "backjumping": True},
+}
+
+
+def _holds(op: str, target: int, values: List[int]) -> bool:
+    if op == '':
+        return values[0] == target
+    if op == 'add':
+        return sum(values) == target
+    if op == 'mult':
+        product = 1
+        for v in values:
+            product *= v
+        return product == target
+    small, large = sorted(values)
+    if op == 'sub':
+        return large - small == target
+    return large == small * target  # div
+
+
+def brute_force(n: int, groups: List[Group]) -> Iterator[Dict[Cell, int]]:
+    """Every solution, by plain enumeration of Latin squares checking cages once filled."""
+    cells = [(i, j) for i in range(n) for j in range(n)]
+    # Check each cage at its last cell in row-major order
+    closing: Dict[Cell, List[Group]] = {}
+    for group in groups:
+        closing.setdefault(max(group[0]), []).append(group)
+    grid: Dict[Cell, int] = {}
+
+    def extend(k: int) -> Iterator[Dict[Cell, int]]:
+        if k == len(cells):
+            yield dict(grid)
+            return
+        i, j = cells[k]
+        used = {grid[(i, c)] for c in range(j)} | {grid[(r, j)] for r in range(i)}
+        for value in range(1, n + 1):
+            if value in used:
+                continue
+            grid[(i, j)] = value
+            if all(_holds(op, target, [grid[c] for c in group_cells])
+                   for group_cells, op, target in closing.get((i, j), ())):
+                yield from extend(k + 1)
+        grid.pop((i, j), None)
+
+    return extend(0)
+
+
+def random_puzzle(n: int, rng: random.Random) -> List[Group]:
+    """
+    A random puzzle built around a Latin square. Some have cages dropped
+    (several solutions) or a target changed (possibly none).
+    """
+    square = latin_square(n, rng)
+    groups = []
+    for cage in partition_cages(n, rng, max_size=4, single_rate=0.1):
+        op, target = cage_operation([square[c] for c in cage], rng)
+        groups.append((set(cage), op, target))
+    kind = rng.random()
+    if kind < 0.4:
+        rng.shuffle(groups)
+        del groups[:rng.randint(1, 2)]
+    elif kind < 0.55:
+        cells, op, target = groups[0]
+        groups[0] = (cells, op, target % n + 1 if op == '' else target + 1)
+    return groups
+
+
+def _key(solution: Dict[Cell, int]) -> Tuple[int, ...]:
+    return tuple(value for _, value in sorted(solution.items()))
+
+
+class IterSolutionsTest(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(2024)
+        counts = set()
+        for index in range(80):
+            n = 4 if index % 2 else 5
+            groups = random_puzzle(n, rng)
+            expected = sorted(_key(s) for s in brute_force(n, groups))
+            counts.add(min(len(expected), 2))
+            for mode, options in MODES.items():
+                with self.subTest(puzzle=index, mode=mode):
+                    solver = ArithmeticPuzzleSolver(n, groups, **options)
+                    found = [_key(s) for s in solver.iter_solutions()]
+                    self.assertEqual(sorted(found), expected)
+                    self.assertEqual(len(set(found)), len(found))
+        # The sample must exercise unsatisfiable, unique and multi-solution puzzles
+        self.assertEqual(counts, {0, 1, 2})
+
+    def test_solve_agrees_with_brute_force(self):
+        rng = random.Random(7)
+        for index in range(20):
+            n = 5
+            groups = random_puzzle(n, rng)
+            solutions = {_key(s) for s in brute_force(n, groups)}
+            for algorithm in ("backtracking", "ac3+backtracking"):
+                for mode in ("default", "backjumping+nogoods", "bounds+backjumping"):
+                    with self.subTest(puzzle=index, algorithm=algorithm, mode=mode):
+                        result = ArithmeticPuzzleSolver(n, groups, **MODES[mode]).solve_result(algorithm)
+                        if solutions:
+                            self.assertEqual(result.status, "solved")
+                            self.assertIn(_key(result.solution), solutions)
+                        else:
+                            self.assertEqual(result.status, "unsat")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+SolutionCache must hand back a valid solution for every symmetric variant
+of a cached puzzle: the canonical solution mapped back through the
+variant's transform has to satisfy the variant's own cages, rows and
+columns.
+
+    python -m pytest test_symmetry.py
+"""
+import random
+import tempfile
+import unittest
+from typing import Dict, List
+
+import example
+from generator import generate_puzzle, latin_square
+from symmetry import SolutionCache, canonicalize
+from test_search import Cell, Group, _holds
+
+
+def variant(n: int, groups: List[Group], rng: random.Random, relabel: bool = False) -> List[Group]:
+    """'groups' with rows and columns permuted, maybe transposed, digits maybe relabeled."""
+    rows, cols = list(range(n)), list(range(n))
+    rng.shuffle(rows)
+    rng.shuffle(cols)
+    transpose = rng.random() < 0.5
+    digits = list(range(1, n + 1))
+    if relabel:
+        rng.shuffle(digits)
+
+    def move(cell: Cell) -> Cell:
+        r, c = (cell[1], cell[0]) if transpose else cell
+        return rows[r], cols[c]
+
+    return [({move(cell) for cell in cells}, op, digits[target - 1] if relabel else target)
+            for cells, op, target in groups]
+
+
+class SolutionCacheTest(unittest.TestCase):
+    def assertSolves(self, n: int, groups: List[Group], solution: Dict[Cell, int]):
+        self.assertIsNotNone(solution)
+        self.assertEqual(sorted(solution), [(i, j) for i in range(n) for j in range(n)])
+        for i in range(n):
+            self.assertEqual({solution[(i, j)] for j in range(n)}, set(range(1, n + 1)))
+            self.assertEqual({solution[(j, i)] for j in range(n)}, set(range(1, n + 1)))
+        for cells, op, target in groups:
+            self.assertTrue(_holds(op, target, [solution[c] for c in sorted(cells)]), (cells, op, target))
+
+    def check_variants(self, cache: SolutionCache, n: int, groups: List[Group],
+                       rng: random.Random, relabel: bool = False):
+        self.assertSolves(n, groups, cache.solve(n, groups))
+        for _ in range(6):
+            moved = variant(n, groups, rng, relabel)
+            hits = cache.hits
+            self.assertSolves(n, moved, cache.solve(n, moved))
+            if canonicalize(n, moved) is not None:
+                # answered from the canonical layer, i.e. through the inverse mapping
+                self.assertEqual(cache.hits, hits + 1)
+
+    def test_cage_puzzles(self):
+        rng = random.Random(1)
+        cache = SolutionCache()
+        puzzles = [(example.n1, example.groups1), (example.n2, example.groups2),
+                   (example.n3, example.groups3), (example.n4, example.groups4)]
+        puzzles += [(p.n, p.groups) for p in (generate_puzzle(n, seed) for n in (5, 6, 7) for seed in range(3))]
+        for index, (n, groups) in enumerate(puzzles):
+            with self.subTest(puzzle=index):
+                self.check_variants(cache, n, groups, rng)
+
+    def test_givens_relabeled(self):
+        # Givens-only puzzles are also canonical under digit relabeling
+        rng = random.Random(2)
+        cache = SolutionCache()
+        for index in range(8):
+            n = 6
+            square = latin_square(n, rng)
+            groups = [({cell}, '', square[cell]) for cell in rng.sample(sorted(square), 15)]
+            with self.subTest(puzzle=index):
+                self.check_variants(cache, n, groups, rng, relabel=True)
+
+    def test_disk_layer(self):
+        # A fresh cache over the same directory maps the stored solution back too
+        rng = random.Random(3)
+        n, groups = example.n3, example.groups3
+        with tempfile.TemporaryDirectory() as directory:
+            SolutionCache(directory=directory).solve(n, groups)
+            cache = SolutionCache(directory=directory)
+            moved = variant(n, groups, rng)
+            self.assertSolves(n, moved, cache.solve(n, moved))
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+The NumPy tensor backend must agree with the bitmask backend: same status,
+and a solution satisfying every cage, including puzzles whose cages overlap.
+
+    python -m pytest test_tensor_backend.py
+"""
+import random
+import unittest
+
+from arithmetic_puzzle import ArithmeticPuzzleSolver
+from generator import cage_operation, latin_square, partition_cages
+from test_search import _key, brute_force, random_puzzle
+
+try:
+    import numpy  # noqa: F401
+except ImportError:
+    numpy = None
+
+
+def overlapping_puzzle(n: int, rng: random.Random):
+    """
+    A loosely constrained random puzzle made of cage pairs: two operations
+    over the same cells, so both land in one same-size batch and each
+    rules out solutions the other allows.
+    """
+    square = latin_square(n, rng)
+    groups = []
+    for cells in partition_cages(n, rng, max_size=2, single_rate=0.0):
+        values = [square[c] for c in cells]
+        ops = sorted({cage_operation(values, rng) for _ in range(8)})
+        if len(ops) > 1 and rng.random() < 0.6:
+            first, second = rng.sample(ops, 2)
+            groups += [(set(cells), *first), (set(cells), *second)]
+    return groups
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TensorBackendTest(unittest.TestCase):
+    def assertAgrees(self, n, groups, algorithm="ac3+backtracking"):
+        solutions = {_key(s) for s in brute_force(n, groups)}
+        tensor = ArithmeticPuzzleSolver(n, groups).solve_result(algorithm, backend="numpy")
+        bitmask = ArithmeticPuzzleSolver(n, groups).solve_result(algorithm)
+        self.assertEqual(tensor.status, bitmask.status)
+        self.assertEqual(tensor.status, "solved" if solutions else "unsat")
+        if solutions:
+            self.assertIn(_key(tensor.solution), solutions)
+            if len(solutions) == 1:
+                self.assertEqual(tensor.solution, bitmask.solution)
+
+    def test_shared_cells(self):
+        # add 5 and sub 1 over the same pair only leave (2, 3) or (3, 2)
+        self.assertAgrees(3, [({(0, 0), (0, 1)}, 'add', 5), ({(0, 0), (0, 1)}, 'sub', 1)])
+
+    def test_overlapping_cages(self):
+        rng = random.Random(11)
+        for index in range(30):
+            n = 4 if index % 2 else 5
+            with self.subTest(puzzle=index):
+                self.assertAgrees(n, overlapping_puzzle(n, rng))
+
+    def test_random_puzzles(self):
+        rng = random.Random(5)
+        for index in range(30):
+            n = 4 if index % 2 else 5
+            groups = random_puzzle(n, rng)
+            for algorithm in ("backtracking", "ac3+backtracking"):
+                with self.subTest(puzzle=index, algorithm=algorithm):
+                    self.assertAgrees(n, groups, algorithm)
+
+
+if __name__ == "__main__":
+    unittest.main()
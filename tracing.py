@@ -0,0 +1,94 @@
+"""
+Diagnostics for ArithmeticPuzzleSolver runs.
+
+The solver reports what it does as events sent to a tracer instead of
+printing. The default tracer is off, so a plain solve() performs no I/O:
+
+    solver.solve("ac3+backtracking")                        # silent
+    solver.solve("ac3+backtracking", tracer=PrintTracer())  # the classic output
+    solver.solve("backtracking", tracer=LoggingTracer(level=NODE))
+
+Levels: OFF (nothing), SUMMARY (start, domains after AC-3, finish) and NODE
+(also every search node and backtrack). Search only emits per-node events
+when the tracer's level is NODE.
+
+Events:
+- "start": algorithm, backend
+- "domains": solver (after AC-3)
+- "portfolio": config (the winning configuration)
+- "node": var, value, depth
+- "backtrack": var, depth
+- "backjump": var, depth (the level search resumes at, with backjumping)
+- "restart": restarts (so far), nodes (so far)
+- "finish": result (a SolveResult)
+"""
+import logging
+import sys
+from typing import Optional, TextIO
+
+OFF, SUMMARY, NODE = 0, 1, 2
+
+
+class Tracer:
+    """Base tracer: level OFF, ignores every event."""
+    level = OFF
+
+    def event(self, kind: str, **data) -> None:
+        pass
+
+
+NULL_TRACER = Tracer()
+
+
+class PrintTracer(Tracer):
+    """Writes events as text to 'stream' (stdout by default)."""
+
+    def __init__(self, level: int = SUMMARY, stream: Optional[TextIO] = None):
+        self.level = level
+        self.stream = stream
+
+    def event(self, kind: str, **data) -> None:
+        out = self.stream or sys.stdout
+        if kind == "start":
+            print(f"Solving with {data['algorithm']}...", file=out)
+        elif kind == "domains":
+            solver = data["solver"]
+            print("\nDomains after AC3:", file=out)
+            for i in range(solver.n):
+                for j in range(solver.n):
+                    print(f"Cell ({i},{j}): {solver.domain_values((i,j))}", file=out)
+        elif kind == "portfolio":
+            config = data["config"]
+            print(f"Portfolio winner: {config[0]} {config[1]}", file=out)
+        elif kind == "node":
+            print(f"{'  ' * data['depth']}{data['var']} = {data['value']}", file=out)
+        elif kind == "backtrack":
+            print(f"{'  ' * data['depth']}{data['var']} exhausted", file=out)
+        elif kind == "backjump":
+            print(f"{'  ' * data['depth']}backjump to level {data['depth']}", file=out)
+        elif kind == "restart":
+            print(f"Restart {data['restarts']} after {data['nodes']} nodes", file=out)
+        elif kind == "finish":
+            result = data["result"]
+            print(f"{result.status} in {result.time_ns.get('total', 0) / 1e6:.3f}ms", file=out)
+
+
+class LoggingTracer(Tracer):
+    """Sends summary events to 'logger' at INFO and node events at DEBUG."""
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = SUMMARY):
+        self.logger = logger or logging.getLogger("arithmetic_puzzle")
+        self.level = level
+
+    def event(self, kind: str, **data) -> None:
+        if kind in ("node", "backtrack", "backjump"):
+            self.logger.debug("%s %s", kind, data)
+        elif kind == "domains":
+            solver = data["solver"]
+            self.logger.info("domains after AC3: %d values left",
+                             sum(d.bit_count() for d in solver.domains.values()))
+        elif kind == "finish":
+            result = data["result"]
+            self.logger.info("finish %s %s", result.status, result.time_ns)
+        else:
+            self.logger.info("%s %s", kind, data)